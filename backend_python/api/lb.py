@@ -1,341 +1,488 @@
 import pandas as pd
 import numpy as np
+import logging
 import math
-import re
-import copy
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 
-def process_lb_file(parsed_data):
+from .lb_cache import file_content_hash, workbook_cache
+from .lb_graph import DEFAULT_ORDERING, build_task_graph
+from .lb_ingest import VALIDATION_MODES, ingest_cache, ingest_models
+from .lb_loaders import load_models, safe_model_name, select_model_sheets
+from .lb_metrics import RunMetrics, profiled
+from .lb_mixed import BALANCING_MODES, balance_mixed, model_quantities
+from .lb_results import result_cache, result_key
+from .lb_uploads import bytes_content_hash, workbook_source
+from .lb_strategies import DEFAULT_BUDGET, parse_strategies, run_strategies
+
+
+logger = logging.getLogger(__name__)
+
+
+def make_final_result(input_data, cycle_time_param, noOfStations_param, crane_pos_param,
+                      ordering=DEFAULT_ORDERING, on_iteration=None, warm_start=True, run_stats=None,
+                      graph=None, strategies=None, strategy_budget=None, context=None):
+    # Compile the sheet once (or reuse the ingest stage's graph); the balancer works on arrays
+    if graph is None:
+        graph = build_task_graph(input_data)
+    # Every requested strategy is run and the best layout kept; the default is the first-fit greedy alone
+    solution, done, report = run_strategies(graph, cycle_time_param, noOfStations_param, crane_pos_param,
+                                            strategies, ordering=ordering, budget=strategy_budget,
+                                            warm_start=warm_start, on_iteration=on_iteration, context=context)
+    if run_stats is not None:
+        run_stats.update(report.pop('run'))
+        run_stats['strategy'] = report
+
+    # Verify all tasks are placed
+    unplaced = input_data[~done & ~graph.skip_mask]
+    if len(unplaced) > 0:
+        logger.warning("⚠️ %d tasks were not placed:\n%s", len(unplaced),
+                       unplaced[['TOTAL Order', 'Time (in minutes)', 'Crane Required', 'Predecessors']])
+
+    return solution
+
+
+def _balance_model(args, on_iteration=None):
+    # Top-level so it can be pickled into a worker process
+    name, df, graph, cycle_time, noOfStations, crane_pos, ordering, warm_start, strategies, budget, context = args
+    start = time.perf_counter()
+    run_stats = {}
+    result = make_final_result(df.copy(), cycle_time, noOfStations, crane_pos, ordering,
+                               on_iteration=on_iteration, warm_start=warm_start, run_stats=run_stats,
+                               graph=graph, strategies=strategies, strategy_budget=budget, context=context)
+    return name, result, time.perf_counter() - start, run_stats
+
+
+def _report(progress, event, **info):
+    if progress is not None:
+        progress(event, **info)
+
+
+def balance_models(model_dfs, cycle_time, noOfStations, crane_pos, ordering=DEFAULT_ORDERING,
+                   parallel=False, workers=None, progress=None, warm_start=True, graphs=None,
+                   strategies=None, strategy_budget=None, contexts=None):
+    """
+    Balance every model and return ``(final_result, model_timings, model_iterations)``.
+
+    ``model_iterations`` holds the convergence-loop report of each model:
+    iteration count, seconds per iteration, passes served from the memo and
+    whether the model's preprocessing was reused, plus the ``strategy`` report of ``run_strategies`` (selected strategy,
+    its station count and efficiency, and the score of every strategy tried).
+
+    ``graphs`` maps model names to already compiled TaskGraphs (from the
+    ingest stage); models without one are compiled here. ``contexts`` maps
+    model names to the BalanceContext to balance them with in sequential
+    mode, so its preprocessing is shared between requests.
+
+    With ``parallel`` the models are farmed out to a process pool of
+    ``workers`` processes (default: one per model, capped at the CPU count).
+    Results are merged back in sheet order either way.
+
+    ``progress(event, **info)`` receives ``model_started``, ``iteration``
+    and ``model_finished`` events. Iteration events are only available in
+    sequential mode since worker processes cannot call back.
+    """
+    graphs = graphs or {}
+    parallel = parallel and len(model_dfs) > 1
+    # Worker processes get their own copy of everything, so a shared context would not be kept warm
+    contexts = {} if parallel else contexts or {}
+    jobs = [
+        (name, df, graphs.get(name), cycle_time, noOfStations, crane_pos, ordering, warm_start,
+         strategies, strategy_budget, contexts.get(name))
+        for name, df in model_dfs.items()
+    ]
+
+    if parallel:
+        workers = workers or min(len(jobs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_balance_model, job) for job in jobs]
+            for job in jobs:
+                _report(progress, 'model_started', model=job[0])
+            for future in as_completed(futures):
+                name, _, elapsed, _ = future.result()
+                _report(progress, 'model_finished', model=name, seconds=elapsed)
+            # Collect in submission order, so the merge is deterministic
+            outcomes = [future.result() for future in futures]
+    else:
+        outcomes = []
+        for job in jobs:
+            name = job[0]
+            _report(progress, 'model_started', model=name)
+            outcome = _balance_model(
+                job,
+                on_iteration=lambda iteration, stations, name=name: _report(
+                    progress, 'iteration', model=name, iteration=iteration, stations=stations
+                ),
+            )
+            _report(progress, 'model_finished', model=name, seconds=outcome[2])
+            outcomes.append(outcome)
+
+    final_result = {name: result for name, result, _, _ in outcomes}
+    model_timings = {name: round(elapsed, 4) for name, _, elapsed, _ in outcomes}
+    model_iterations = {name: run_stats for name, _, _, run_stats in outcomes}
+    return final_result, model_timings, model_iterations
+
+
+def workbook_hash(parsed_data):
+    """Content hash of the request's workbook, in memory or on disk."""
+    source, _ = workbook_source(parsed_data)
+    if isinstance(source, (bytes, bytearray)):
+        return bytes_content_hash(source)
+    return file_content_hash(source)
+
+
+def load_model_tables(excel_path, content_hash, models=None, filename=None):
+    """
+    Return ``(model_dfs, sheets, cache_hit)`` for the requested models.
+
+    Only ModelData sheets that match ``models`` are considered, and of those
+    only the ones not already in the workbook cache are read from disk.
+    ``sheets`` reports which sheets were selected and which were skipped.
+    ``excel_path`` may be any upload ``load_models`` reads (workbook, zip of
+    tables, flat CSV / Parquet / Feather), as a path or as bytes.
+    """
+    entry = workbook_cache.get(content_hash)
+    if entry is None:
+        loaded, sheet_names = load_models(excel_path, models, filename)
+        entry = {'sheet_names': sheet_names, 'models': loaded}
+        workbook_cache.put(content_hash, entry)
+        cache_hit = False
+    else:
+        selected, _ = select_model_sheets(entry['sheet_names'], models)
+        missing = {safe_name for _, safe_name in selected if safe_name not in entry['models']}
+        cache_hit = not missing
+        if missing:
+            loaded, _ = load_models(excel_path, missing, filename)
+            entry['models'].update(loaded)
+            workbook_cache.put(content_hash, entry)
+
+    # Keep workbook order regardless of what came from the cache
+    selected, skipped = select_model_sheets(entry['sheet_names'], models)
+    model_dfs = {safe_name: entry['models'][safe_name] for _, safe_name in selected}
+    sheets = {
+        'selected': [sheet_name for sheet_name, _ in selected],
+        'skipped': skipped,
+    }
+    return model_dfs, sheets, cache_hit
+
+
+def line_timing(shift, models):
+    """Return ``(total_time, takt_time, cycle_time, total_model)`` for a shift and model mix."""
+    # Calculate total number of units across all models
+    total_model = sum(model['quantity'] for model in models)
+
+    total_time = 455 if shift == "General" else 425
+    takt_time = total_time / total_model
+    cycle_time = takt_time - 2.2
+    return total_time, takt_time, cycle_time, total_model
+
+
+# Shapes of the balancing result returned to the client
+RESPONSE_FORMATS = ('verbose', 'compact')
+
+
+def _station_numbers(total_stations, noOfStations):
+    # Stations added beyond the requested count are numbered -k .. -1 in front of the line
+    offset = total_stations - noOfStations
+    return [idx - offset if idx < offset else idx - offset + 1 for idx in range(total_stations)]
+
+
+def _task_labels(df):
+    """'TOTAL Order -> Steps' for every row of a model, built once."""
+    return [f"{order} -> {steps}" for order, steps in zip(df['TOTAL Order'].tolist(), df['Steps'].tolist())]
+
+
+def _station_positions(df, station_list):
+    """Row positions of every station's tasks, flattened, plus the station each belongs to."""
+    counts = [len(station['task_order']) for station in station_list]
+    labels = [task_idx for station in station_list for task_idx in station['task_order']]
+    positions = df.index.get_indexer(labels) if labels else np.empty(0, dtype=np.int64)
+    station_ids = np.repeat(np.arange(len(station_list)), counts)
+    return positions, station_ids, counts
+
+
+def _station_manpower(df, positions, station_ids, total_stations):
+    """Total Manpower (rounded up) per station, summed with one bincount."""
+    manpower = df['Manpower (19)']
+    if pd.api.types.is_numeric_dtype(manpower):
+        totals = np.bincount(station_ids, weights=manpower.to_numpy(dtype=np.float64)[positions],
+                             minlength=total_stations)
+    else:
+        # Non-numeric sheets keep plain Python summing (and its errors)
+        values = manpower.tolist()
+        totals = [0] * total_stations
+        for station, pos in zip(station_ids.tolist(), positions.tolist()):
+            totals[station] += values[pos]
+    return [math.ceil(total) for total in totals]
+
+
+def post_process_result(final_result, model_dfs, noOfStations):
+    """Add station numbers, manpower and readable task lists to every station in place."""
+    for model_name, station_list in final_result.items():
+        df = model_dfs[model_name]
+        total_stations = len(station_list)
+
+        # Get all activities with Crane Required = -1
+        task_labels = _task_labels(df)
+        activities_before_list = [
+            task_labels[pos] for pos in np.flatnonzero((df['Crane Required'] == -1).to_numpy())
+        ]
+
+        positions, station_ids, counts = _station_positions(df, station_list)
+        station_numbers = _station_numbers(total_stations, noOfStations)
+        manpower = _station_manpower(df, positions, station_ids, total_stations)
+
+        start = 0
+        for idx, station in enumerate(station_list):
+            end = start + counts[idx]
+            station['Station_Number'] = station_numbers[idx]
+            station['Total_Manpower'] = manpower[idx]
+            station['Final_Order'] = [task_labels[pos] for pos in positions[start:end]]
+            # Activity Need to done Before (same for all stations in a model)
+            station['Activity Need to done Before'] = activities_before_list
+            start = end
+
+    return final_result
+
+
+def compact_result(final_result, model_dfs, noOfStations):
+    """
+    Compact encoding of a balancing result.
+
+    Every task is listed once per model (``tasks[id]`` is its
+    'TOTAL Order -> Steps' text, ``id`` its row position) and stations refer
+    to task ids. The 'Activity Need to done Before' list is sent once per
+    model as ``activities_before`` instead of being repeated on every station.
+    """
+    compact = {}
+    for model_name, station_list in final_result.items():
+        df = model_dfs[model_name]
+        total_stations = len(station_list)
+
+        positions, station_ids, counts = _station_positions(df, station_list)
+        station_numbers = _station_numbers(total_stations, noOfStations)
+        manpower = _station_manpower(df, positions, station_ids, total_stations)
+        task_ids = positions.tolist()
+
+        stations = []
+        start = 0
+        for idx, station in enumerate(station_list):
+            end = start + counts[idx]
+            stations.append({
+                'Station_Number': station_numbers[idx],
+                'crane_aval': station['crane_aval'],
+                'time_rem': station['time_rem'],
+                'Total_Manpower': manpower[idx],
+                'tasks': task_ids[start:end],
+            })
+            start = end
+
+        compact[model_name] = {
+            'tasks': _task_labels(df),
+            'activities_before': np.flatnonzero((df['Crane Required'] == -1).to_numpy()).tolist(),
+            'stations': stations,
+        }
+    return compact
+
+
+def format_result(final_result, model_dfs, noOfStations, response_format='verbose'):
+    """Post-process a balancing result into the requested response format."""
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown response format '{response_format}'. "
+                         f"Expected one of: {', '.join(RESPONSE_FORMATS)}")
+    if response_format == 'compact':
+        return compact_result(final_result, model_dfs, noOfStations)
+    return post_process_result(final_result, model_dfs, noOfStations)
+
+
+def execution_metadata(parsed_data, model_count):
+    """The ``metadata`` fields that describe how a request ran rather than its result."""
+    # Mixed mode balances one joint graph, so it never runs in parallel
+    parallel = bool(parsed_data.get('parallel', False)) and (parsed_data.get('mode') or 'per_model') != 'mixed'
+    return {
+        'parallel': parallel,
+        'workers': (parsed_data.get('workers') or min(model_count, os.cpu_count() or 1)) if parallel else 1,
+        'warm_start': bool(parsed_data.get('warm_start', True)),
+    }
+
+
+def process_lb_file(parsed_data, progress=None):
+    """
+    Balance the requested models of an uploaded workbook.
+
+    ``progress(event, **info)`` is an optional callback used by the job API
+    to follow a run: ``phase`` events for loading / balancing /
+    post-processing, then the per-model events from ``balance_models``.
+
+    Phase timings and placement counters are always returned in
+    ``metadata.timings`` / ``metadata.counters``; with ``parsed_data['profile']``
+    the run is also profiled and the report added as ``metadata.profile``.
+
+    Successful results are kept in the result cache under the workbook hash
+    and the canonical request parameters; an identical request is answered
+    from there, with ``metadata.result_cache.hit`` set (and the execution
+    fields of ``metadata`` taken from the current request). ``use_cache=False``
+    forces a fresh run (which then replaces the cached entry) and profiled
+    runs always bypass the cache.
+    """
+    profile = bool(parsed_data.get('profile', False))
+    use_cache = bool(parsed_data.get('use_cache', True))
+
+    key = None
+    if not profile:
+        started = time.perf_counter()
+        content_hash = parsed_data.get('content_hash') or workbook_hash(parsed_data)
+        parsed_data = dict(parsed_data, content_hash=content_hash)
+        key = result_key(content_hash, parsed_data)
+    if key is not None and use_cache:
+        cached = result_cache.get(key)
+        if cached is not None:
+            result, stored_at = cached
+            models = list(result['metadata']['model_timings'])
+            _report(progress, 'phase', phase='result_cache', models=models)
+            for name in models:
+                _report(progress, 'model_finished', model=name, seconds=0.0)
+            # The entry may come from a request that ran differently (parallel, workers, warm start)
+            result['metadata'].update(execution_metadata(parsed_data, len(models)))
+            result['metadata']['result_cache'] = {
+                'hit': True,
+                'key': key,
+                'age_seconds': round(time.time() - stored_at, 3),
+                'lookup_seconds': round(time.perf_counter() - started, 6),
+            }
+            logger.info("✅ Result cache hit: %s", key[:24])
+            return result
+
+    with profiled(profile) as profile_report:
+        result = _process_lb_file(parsed_data, progress)
+    if result.get('success'):
+        if key is not None:
+            result_cache.put(key, result)
+        result['metadata']['result_cache'] = {'hit': False, 'key': key}
+    if profile and result.get('success'):
+        result['metadata']['profile'] = profile_report
+    return result
+
+
+def _process_lb_file(parsed_data, progress=None):
     try:
         data = parsed_data
-        print("\n✅ Final data dictionary created:\n")
-        print(data)
-
-        # ✅ Step 1: Read the Excel file using pandas
-        excel_path = data['file_path']
-        model_set = set(model['name'] for model in data['models'])
-
-        # Read all sheets into a dictionary
-        sheets_dict = pd.read_excel(excel_path, sheet_name=None)
-
-        # ✅ Step 2: Iterate through sheet names and create DataFrames dynamically
-        model_dfs = {}  # to store all model dataframes
-
-        for sheet_name, df in sheets_dict.items():
-            # Check if sheet name follows the pattern "ModelData_<ModelName>"
-            match = re.match(r"ModelData_(.+)", sheet_name)
-            if match:
-                model_name = match.group(1)
-                # Replace invalid chars (like '.') with '_' for valid variable name
-                safe_name = model_name.replace('.', '_')
-                model_dfs[safe_name] = df
-                print(f"✅ Created DataFrame: {safe_name} (from sheet: {sheet_name})")
-
-        # ✅ Step 3: Display all created DataFrames
-        print("\nAll created DataFrames:")
-        for name, df in model_dfs.items():
-            print(f"\n📘 {name} (rows: {len(df)}, columns: {len(df.columns)})")
-            print(df.head())
-
-        # Calculate total number of units across all models
-        total_model = sum(model['quantity'] for model in data['models'])
-        print(f"✅ Total number of units to be done: {total_model}")
+        metrics = RunMetrics()
+        started = time.perf_counter()
+        logger.info("✅ Line balancing request: shift=%s, stations=%s, models=%s",
+                    data.get('shift'), data.get('noOfStations'), [m['name'] for m in data['models']])
+        if logger.isEnabledFor(logging.DEBUG):
+            # The upload itself can be megabytes; log its size, not its bytes
+            logged = {key: value for key, value in data.items() if key != 'file_bytes'}
+            if data.get('file_bytes') is not None:
+                logged['file_bytes'] = f"<{len(data['file_bytes'])} bytes>"
+            logger.debug("Final data dictionary: %s", logged)
+
+        _report(progress, 'phase', phase='loading')
+
+        # ✅ Step 1: Read only the requested ModelData sheets (or reuse an earlier parse of the same bytes)
+        with metrics.phase('loading'):
+            source, filename = workbook_source(data)
+            model_set = set(model['name'] for model in data['models'])
+            content_hash = data.get('content_hash') or workbook_hash(data)
+            model_dfs, sheets, workbook_cache_hit = load_model_tables(source, content_hash, model_set, filename)
+        missing = sorted(name for name in model_set if safe_model_name(name) not in model_dfs)
+        if missing:
+            raise ValueError(f"No ModelData sheet for: {', '.join(missing)}")
+        if workbook_cache_hit:
+            logger.info("✅ Workbook cache hit: %s", content_hash[:12])
+        logger.info("✅ Selected sheets: %s (skipped: %s)", sheets['selected'], sheets['skipped'])
+
+        # ✅ Step 2: Parse and validate the precedence graphs once per workbook
+        validation = data.get('validation') or 'warn'
+        if validation not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode '{validation}'. "
+                             f"Expected one of: {', '.join(VALIDATION_MODES)}")
+        with metrics.phase('ingest'):
+            ingested = ingest_models(content_hash, model_dfs)
+        precedence_errors = {name: model.errors for name, model in ingested.items() if model.errors}
+        if precedence_errors and validation == 'strict':
+            return {
+                'success': False,
+                'message': 'Precedence validation failed',
+                'errors': precedence_errors,
+            }
+
+        # Display all created DataFrames (debug only, formatting them is not free)
+        if logger.isEnabledFor(logging.DEBUG):
+            for name, df in model_dfs.items():
+                logger.debug("📘 %s (rows: %d, columns: %d)\n%s", name, len(df), len(df.columns), df.head())
 
         # Calculate times
-        total_time = 455 if data["shift"] == "General" else 425
-        takt_time = total_time / total_model
-        cycle_time = takt_time - 2.2
+        total_time, takt_time, cycle_time, total_model = line_timing(data['shift'], data['models'])
         noOfStations = data['noOfStations']
-
-        print(f"✅ Cycle Time: {cycle_time:.2f} minutes")
-        print(f"✅ Number of Stations: {noOfStations}")
-
-        # Define the line balancing function with proper parameters
-        def make_final_result(input_data, cycle_time_param, noOfStations_param, crane_pos_param):
-            # --- Step 1: Calculate total_df_time ---
-            input_data['Time (in minutes)'] = pd.to_numeric(input_data['Time (in minutes)'], errors='coerce')
-            input_data['Crane Required'] = pd.to_numeric(input_data['Crane Required'], errors='coerce')
-
-            # Filter valid tasks (not -1)
-            valid_tasks = input_data['Crane Required'] != -1
-            total_df_time = input_data.loc[valid_tasks, 'Time (in minutes)'].sum()
-
-            # --- Step 2: Create task_index_dict ---
-            task_index_dict = {row['TOTAL Order']: idx for idx, row in input_data.iterrows()}
-
-            # --- Step 3: Update 'Predecessors' column ---
-            def replace_predecessors(val):
-                if pd.isna(val) or str(val).strip() == "":
-                    return {}  # Return empty dict instead of NaN
-                else:
-                    preds = [p.strip() for p in str(val).split(',')]
-                    return {p: task_index_dict.get(p, None) for p in preds if p}
-
-            input_data['Predecessors'] = input_data['Predecessors'].apply(replace_predecessors)
-
-            # --- Step 4: Add columns ---
-            input_data['done_or_not'] = False
-            input_data['station_placed'] = None
-
-            stations_required = int(np.ceil(total_df_time / cycle_time_param))
-            check_done = 1
-            count = 1
-            curr_stations = max(noOfStations_param, stations_required)
-
-            solution = []
-
-            while check_done and count < 10:
-                # Reset for each iteration
-                input_data['done_or_not'] = False
-                input_data['station_placed'] = None
-
-                crane_pos_list = crane_pos_param.copy()
-
-                # Adjust crane positions if we need more stations
-                if curr_stations > noOfStations_param:
-                    diff = curr_stations - noOfStations_param
-                    # Add crane to new stations at the beginning
-                    new_crane_positions = list(range(1, diff + 1))
-                    # Shift original crane positions
-                    shifted_positions = [pos + diff for pos in crane_pos_list]
-                    crane_pos_list = new_crane_positions + shifted_positions
-
-                # Initialize station list
-                template = {"crane_aval": 0, "task_order": [], "time_rem": cycle_time_param}
-                list_of_dicts = [copy.deepcopy(template) for _ in range(curr_stations)]
-
-                # Mark stations with cranes
-                for i in crane_pos_list:
-                    if 0 <= i - 1 < len(list_of_dicts):
-                        list_of_dicts[i - 1]["crane_aval"] = 1
-
-                # Get crane-required tasks
-                crane_req_index = set(input_data.index[input_data['Crane Required'] == 1])
-
-                # Handle tasks that should be skipped (Crane Required == -1)
-                skip_tasks = set(input_data.index[input_data['Crane Required'] == -1])
-                for i in skip_tasks:
-                    input_data.loc[i, 'done_or_not'] = True
-                    input_data.loc[i, 'station_placed'] = -1
-
-                in_p = 0
-
-                # ----------------------------
-                # Nested helper: make_order()
-                # ----------------------------
-                def make_order(i):
-                    element_dict = {}
-                    levels = []
-                    old_list = [i]
-                    curr_level = 0
-
-                    while len(old_list) > 0 and curr_level <= 100:
-                        new_list = []
-                        for j in old_list:
-                            depend_dict = input_data.loc[j, "Predecessors"]
-                            max_done = -1
-
-                            # Handle dependencies
-                            if isinstance(depend_dict, dict) and depend_dict:
-                                for key, items in depend_dict.items():
-                                    if items is not None and items in input_data.index:
-                                        if input_data.loc[items, "done_or_not"] == True:
-                                            station = input_data.loc[items, "station_placed"]
-                                            if station is not None and station != -1:
-                                                max_done = max(max_done, station)
-                                        else:
-                                            if items not in skip_tasks:
-                                                new_list.append(items)
-
-                            if j in element_dict:
-                                element_dict[j]["level"] = max(element_dict[j]["level"], curr_level)
-                                element_dict[j]["after_pos"] = max(element_dict[j]["after_pos"], max_done)
-                            else:
-                                element_dict[j] = {"level": curr_level, "after_pos": max_done}
-
-                        curr_level += 1
-                        old_list = list(set(new_list))  # Remove duplicates
-
-                    # Build levels
-                    for p in range(curr_level):
-                        levels.append([])
-
-                    for key, value in element_dict.items():
-                        levels[value["level"]].append((key, value["after_pos"]))
-
-                    # Sort each level by after_pos
-                    for idx in range(len(levels)):
-                        levels[idx].sort(key=lambda x: x[1])
-
-                    # Propagate max position constraint
-                    prev_max = -1
-                    for idx in range(len(levels)):
-                        if idx != 0 and levels[idx]:
-                            levels[idx] = [(item[0], max(prev_max, item[1])) for item in levels[idx]]
-                        if levels[idx]:
-                            prev_max = levels[idx][-1][1]
-
-                    return levels
-
-                # ----------------------------
-                # Helper: place_the_items_1() - for crane-required tasks
-                # ----------------------------
-                def place_the_items_1(order_level):
-                    nonlocal in_p
-                    for level in order_level:
-                        for item in level:
-                            task_idx = item[0]
-                            min_station = item[1]
-
-                            if input_data.loc[task_idx, "done_or_not"]:
-                                continue
-
-                            task_time = input_data.loc[task_idx, "Time (in minutes)"]
-                            needs_crane = input_data.loc[task_idx, "Crane Required"] == 1
-
-                            final_pos = max(min_station, in_p) if min_station >= 0 else in_p
-                            placed = False
-
-                            # Try to place in existing stations
-                            for w in range(final_pos, len(list_of_dicts)):
-                                # Check crane requirement
-                                if needs_crane and list_of_dicts[w]["crane_aval"] != 1:
-                                    continue
-
-                                # Check time constraint
-                                if task_time <= list_of_dicts[w]["time_rem"]:
-                                    list_of_dicts[w]["task_order"].append(task_idx)
-                                    list_of_dicts[w]["time_rem"] -= task_time
-                                    in_p = max(in_p, w)
-                                    input_data.loc[task_idx, "done_or_not"] = True
-                                    input_data.loc[task_idx, "station_placed"] = w
-                                    placed = True
-                                    break
-
-                            # If not placed, add new station
-                            if not placed:
-                                new_station = {"crane_aval": 1 if needs_crane else 0,
-                                            "task_order": [task_idx],
-                                            "time_rem": cycle_time_param - task_time}
-                                list_of_dicts.append(new_station)
-                                in_p = len(list_of_dicts) - 1
-                                input_data.loc[task_idx, "done_or_not"] = True
-                                input_data.loc[task_idx, "station_placed"] = in_p
-
-                # ----------------------------
-                # Helper: place_the_items_0() - for non-crane tasks
-                # ----------------------------
-                def place_the_items_0(order_level):
-                    nonlocal in_p
-                    for level in order_level:
-                        for item in level:
-                            task_idx = item[0]
-                            min_station = item[1]
-
-                            if input_data.loc[task_idx, "done_or_not"]:
-                                continue
-
-                            task_time = input_data.loc[task_idx, "Time (in minutes)"]
-                            final_pos = max(min_station, in_p) if min_station >= 0 else in_p
-                            placed = False
-
-                            # Try to place in existing stations
-                            for w in range(final_pos, len(list_of_dicts)):
-                                if task_time <= list_of_dicts[w]["time_rem"]:
-                                    list_of_dicts[w]["task_order"].append(task_idx)
-                                    list_of_dicts[w]["time_rem"] -= task_time
-                                    in_p = max(in_p, w)
-                                    input_data.loc[task_idx, "done_or_not"] = True
-                                    input_data.loc[task_idx, "station_placed"] = w
-                                    placed = True
-                                    break
-
-                            # If not placed, add new station
-                            if not placed:
-                                new_station = {"crane_aval": 0,
-                                            "task_order": [task_idx],
-                                            "time_rem": cycle_time_param - task_time}
-                                list_of_dicts.append(new_station)
-                                in_p = len(list_of_dicts) - 1
-                                input_data.loc[task_idx, "done_or_not"] = True
-                                input_data.loc[task_idx, "station_placed"] = in_p
-
-                # --- Process crane-required tasks first ---
-                for i in sorted(crane_req_index):
-                    if not input_data.loc[i, "done_or_not"]:
-                        order_level = make_order(i)
-                        place_the_items_1(order_level)
-
-                # --- Process remaining non-crane tasks ---
-                in_p = 0  # Reset position pointer
-                for index, row in input_data.iterrows():
-                    if row["Crane Required"] == 0 and not row["done_or_not"]:
-                        order_level_0 = make_order(index)
-                        place_the_items_0(order_level_0)
-
-                # Check convergence
-                solution = list_of_dicts
-                if curr_stations < len(list_of_dicts):
-                    curr_stations = len(list_of_dicts)
-                else:
-                    check_done = 0
-
-                count += 1
-
-            # Verify all tasks are placed
-            unplaced = input_data[(input_data['done_or_not'] == False) & (input_data['Crane Required'] != -1)]
-            if len(unplaced) > 0:
-                print(f"⚠️ Warning: {len(unplaced)} tasks were not placed:")
-                print(unplaced[['TOTAL Order', 'Time (in minutes)', 'Crane Required', 'Predecessors']])
-
-            return solution
-
-        # Generate results for each model
-        final_result = {}
-
-        for name, df in model_dfs.items():
-            # Pass parameters explicitly instead of using global variables
-            result = make_final_result(df.copy(), cycle_time, noOfStations, data['crane_pos'])
-            final_result[name] = result
-
-        print("\n✅ Line balancing completed for all models")
-
-        # Post-process to add additional fields
-        for model_name, station_list in final_result.items():
-            df = model_dfs[model_name]
-            total_stations = len(station_list)
-
-            # Get all activities with Crane Required = -1
-            activities_before = df[df['Crane Required'] == -1]
-            activities_before_list = [
-                f"{row['TOTAL Order']} -> {row['Steps']}"
-                for idx, row in activities_before.iterrows()
-            ]
-
-            for idx, station in enumerate(station_list):
-                # Station Number
-                if idx < total_stations - noOfStations:
-                    station['Station_Number'] = -(total_stations - noOfStations - idx)
-                else:
-                    station['Station_Number'] = idx - (total_stations - noOfStations) + 1
-
-                # Total Manpower (rounded up)
-                station['Total_Manpower'] = math.ceil(
-                    sum(df.loc[task_idx, 'Manpower (19)'] for task_idx in station['task_order'])
+        ordering = data.get('ordering') or DEFAULT_ORDERING
+        parallel = bool(data.get('parallel', False))
+        workers = data.get('workers') or None
+        warm_start = bool(data.get('warm_start', True))
+        response_format = data.get('response_format') or 'verbose'
+        mode = data.get('mode') or 'per_model'
+        strategies = parse_strategies(data.get('strategies'))
+        strategy_budget = data.get('strategy_budget') or DEFAULT_BUDGET
+        if mode not in BALANCING_MODES:
+            raise ValueError(f"Unknown balancing mode '{mode}'. Expected one of: {', '.join(BALANCING_MODES)}")
+
+        logger.info("✅ Units: %s, cycle time: %.2f minutes, stations: %s", total_model, cycle_time, noOfStations)
+
+        if parallel:
+            workers = workers or min(len(model_dfs), os.cpu_count() or 1)
+
+        graphs = {name: model.graph for name, model in ingested.items()}
+        # Warm runs share each model's preprocessing through the ingest cache; cold runs rebuild it
+        contexts = {name: model.context(ordering) for name, model in ingested.items()} if warm_start else {}
+        mixed = None
+        if mode == 'mixed':
+            # One shared layout for the whole mix, task times weighted by quantity
+            _report(progress, 'phase', phase='balancing', models=['mixed'])
+            _report(progress, 'model_started', model='mixed')
+            with metrics.phase('balancing'):
+                started_mixed = time.perf_counter()
+                final_result, mixed = balance_mixed(
+                    graphs, model_quantities(data['models']), cycle_time, noOfStations, data['crane_pos'],
+                    ordering, warm_start=warm_start, strategies=strategies, strategy_budget=strategy_budget,
+                    on_iteration=lambda iteration, stations: _report(
+                        progress, 'iteration', model='mixed', iteration=iteration, stations=stations
+                    ),
                 )
+            model_timings = {'mixed': round(time.perf_counter() - started_mixed, 4)}
+            model_iterations = {'mixed': mixed.pop('iterations')}
+            _report(progress, 'model_finished', model='mixed', seconds=model_timings['mixed'])
+            parallel = False
+        else:
+            # Generate results for each model
+            _report(progress, 'phase', phase='balancing', models=list(model_dfs))
+            with metrics.phase('balancing'):
+                final_result, model_timings, model_iterations = balance_models(
+                    model_dfs, cycle_time, noOfStations, data['crane_pos'], ordering,
+                    parallel=parallel, workers=workers, progress=progress, warm_start=warm_start,
+                    graphs=graphs, strategies=strategies, strategy_budget=strategy_budget, contexts=contexts
+                )
+        # Which strategy won for each model, with its station count and efficiency
+        model_strategies = {name: run_stats.pop('strategy') for name, run_stats in model_iterations.items()}
+        for name, run_stats in model_iterations.items():
+            metrics.count('convergence_iterations', run_stats['iterations'])
+            metrics.add_counters(run_stats['counters'])
+            logger.info("✅ %s: %d iteration(s), %d from memo, preprocessing %s, %.3fs, strategy %s", name,
+                        run_stats['iterations'], run_stats['memo_hits'],
+                        'reused' if run_stats['context_reused'] else 'built', model_timings[name],
+                        model_strategies[name]['strategy'])
 
-                # Final Order
-                station['Final_Order'] = [
-                    f"{df.loc[task_idx, 'TOTAL Order']} -> {df.loc[task_idx, 'Steps']}"
-                    for task_idx in station['task_order']
-                ]
-
-                # Activity Need to done Before (same for all stations in a model)
-                station['Activity Need to done Before'] = activities_before_list
+        # Post-process to add additional fields
+        _report(progress, 'phase', phase='post_processing')
+        with metrics.phase('post_processing'):
+            final_result = format_result(final_result, model_dfs, noOfStations, response_format)
 
-        print("\n✅ Post-processing completed")
-        print(final_result)
+        logger.info("✅ Line balancing completed in %.3fs", time.perf_counter() - started)
+        logger.debug("Final result: %s", final_result)
 
+        timings = metrics.to_dict()
         return {
             'success': True,
             'data': final_result,
@@ -344,17 +491,37 @@ def process_lb_file(parsed_data):
                 'takt_time': takt_time,
                 'total_time': total_time,
                 'total_models': total_model,
-                'noOfStations': noOfStations
+                'noOfStations': noOfStations,
+                'mode': mode,
+                'mixed': mixed,
+                'ordering': ordering,
+                **execution_metadata(data, len(model_dfs)),
+                'strategy_budget': strategy_budget,
+                'strategies': model_strategies,
+                'response_format': response_format,
+                'timings': {
+                    'phases': timings['phases'],
+                    'models': model_timings,
+                    'total': round(time.perf_counter() - started, 6),
+                },
+                'counters': timings['counters'],
+                'model_timings': model_timings,
+                'model_iterations': model_iterations,
+                'workbook_hash': content_hash,
+                'workbook_cache': dict(workbook_cache.stats(), hit=workbook_cache_hit),
+                'ingest_cache': ingest_cache.stats(),
+                'validation': validation,
+                'precedence_errors': precedence_errors,
+                'sheets': sheets
             }
         }
 
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        print(f"❌ Error occurred: {str(e)}")
-        print(f"Full traceback:\n{error_details}")
+        logger.error("❌ Error occurred: %s\nFull traceback:\n%s", e, error_details)
         return {
             'success': False,
             'message': str(e),
             'traceback': error_details
-        }
\ No newline at end of file
+        }
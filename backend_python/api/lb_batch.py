@@ -0,0 +1,125 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .lb import load_model_tables, process_lb_file
+from .lb_ingest import ingest_models
+from .lb_uploads import workbook_source
+
+
+logger = logging.getLogger(__name__)
+
+# How batch results are returned: one combined JSON document, or one NDJSON line per result
+BATCH_OUTPUTS = ('json', 'ndjson')
+
+# Upper bounds for one batch request
+MAX_BATCH_LINES = int(os.environ.get('LB_BATCH_MAX_LINES', 64))
+BATCH_WORKERS = int(os.environ.get('LB_BATCH_WORKERS', 4))
+
+
+def prepare_workbooks(lines):
+    """
+    Parse every distinct workbook of a batch once, before any line runs.
+
+    Each workbook is read for the union of the models its lines request
+    and compiled by the ingest stage, so the lines only ever hit the
+    workbook and ingest caches. Returns ``{content_hash: error message}``
+    for workbooks that could not be read; their lines are not run.
+    """
+    workbooks = {}
+    for parsed_data in lines:
+        entry = workbooks.setdefault(parsed_data['content_hash'], {'data': parsed_data, 'models': set()})
+        entry['models'].update(model['name'] for model in parsed_data['models'])
+
+    failed = {}
+    for content_hash, entry in workbooks.items():
+        source, filename = workbook_source(entry['data'])
+        try:
+            model_dfs, _, _ = load_model_tables(source, content_hash, entry['models'], filename)
+            ingest_models(content_hash, model_dfs)
+        except Exception as e:
+            logger.error("❌ Could not read workbook %s: %s", filename, e)
+            failed[content_hash] = f'Could not read workbook {filename}: {e}'
+    return failed
+
+
+def _line_info(index, parsed_data):
+    return {
+        'index': index,
+        'line': parsed_data.get('line'),
+        'shift': parsed_data.get('shift'),
+        'date': parsed_data.get('date'),
+        'workbook': parsed_data.get('file_name'),
+    }
+
+
+def _run_line(index, parsed_data):
+    started = time.perf_counter()
+    try:
+        result = process_lb_file(parsed_data)
+    except Exception as e:
+        result = {'success': False, 'message': str(e)}
+    return dict(_line_info(index, parsed_data), seconds=round(time.perf_counter() - started, 4), result=result)
+
+
+def batch_pool_size(workers, lines):
+    # Never more threads than lines, and never more than the configured bound
+    return max(1, min(workers or BATCH_WORKERS, BATCH_WORKERS, len(lines) or 1))
+
+
+def iter_lb_batch(lines, workers=None):
+    """
+    Balance every line configuration of a batch, yielding results as they finish.
+
+    ``lines`` are complete ``process_lb_file`` inputs. Workbooks are parsed
+    once up front (``prepare_workbooks``); the lines then run on a pool of at
+    most ``workers`` threads (capped at ``LB_BATCH_WORKERS``). Each yielded
+    item carries the line's ``index`` in the request, so a client can put
+    streamed results back in order.
+    """
+    workers = batch_pool_size(workers, lines)
+    failed = prepare_workbooks(lines)
+
+    runnable = []
+    for index, parsed_data in enumerate(lines):
+        error = failed.get(parsed_data['content_hash'])
+        if error:
+            yield dict(_line_info(index, parsed_data), seconds=0.0, result={'success': False, 'message': error})
+        else:
+            runnable.append((index, parsed_data))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lb-batch') as executor:
+        futures = [executor.submit(_run_line, index, parsed_data) for index, parsed_data in runnable]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def batch_summary(items, workbooks, workers, started):
+    """Totals for a finished batch (the last NDJSON line, or the combined response's metadata)."""
+    succeeded = sum(1 for item in items if item['result'].get('success'))
+    return {
+        'total_lines': len(items),
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'result_cache_hits': sum(
+            1 for item in items
+            if item['result'].get('metadata', {}).get('result_cache', {}).get('hit')
+        ),
+        'workbooks': workbooks,
+        'workers': workers,
+        'total_seconds': round(time.perf_counter() - started, 4),
+    }
+
+
+def run_lb_batch(lines, workers=None):
+    """Run a batch and return one combined response, with results in request order."""
+    started = time.perf_counter()
+    items = sorted(iter_lb_batch(lines, workers), key=lambda item: item['index'])
+    workbooks = {parsed_data['file_name']: parsed_data['content_hash'] for parsed_data in lines}
+    summary = batch_summary(items, workbooks, batch_pool_size(workers, lines), started)
+    return {
+        'success': summary['failed'] == 0,
+        'results': items,
+        'metadata': summary,
+    }
@@ -0,0 +1,138 @@
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from .lb_batch import (BATCH_OUTPUTS, MAX_BATCH_LINES, batch_pool_size, batch_summary, iter_lb_batch,
+                       run_lb_batch)
+from .lb_uploadController import parse_crane_pos, parse_lb_options, parse_workers, read_uploaded_workbook
+import json
+import logging
+import time
+import traceback
+
+lb_batchController_bp = Blueprint('lb_batchController_bp', __name__)
+logger = logging.getLogger(__name__)
+
+# Form fields a line configuration may override for itself
+LINE_OPTION_FIELDS = ('ordering', 'parallel', 'workers', 'warm_start', 'format', 'profile', 'validation',
+                      'mode', 'cache', 'strategy', 'strategy_budget')
+
+
+def _bad_request(message):
+    return jsonify({
+        'success': False,
+        'message': message
+    }), 400
+
+
+def parse_lb_batch_form():
+    """
+    Validate the batch form: ``lines`` (JSON list of line configurations) and the workbooks.
+
+    Workbooks come as ``workContent`` (shared by every line) and/or any
+    number of ``workbooks`` files; a line picks one by file name with
+    ``"workbook"``, and otherwise uses the shared one (or the only upload).
+    Form-level options apply to every line unless the line overrides them.
+
+    Returns ``(lines, None)`` or ``(None, (response, status))``.
+    """
+    try:
+        configs = json.loads(request.form.get('lines', '[]') or '[]')
+    except json.JSONDecodeError as e:
+        return None, _bad_request(f'Invalid lines JSON format: {str(e)}')
+    if not isinstance(configs, list) or not configs:
+        return None, _bad_request('No line configurations given')
+    if len(configs) > MAX_BATCH_LINES:
+        return None, _bad_request(f'Too many line configurations ({len(configs)}), at most {MAX_BATCH_LINES}')
+
+    # Every upload is read and hashed once, however many lines use it
+    workbooks = {}
+    shared = None
+    uploads = [('workContent', f) for f in request.files.getlist('workContent')]
+    uploads += [('workbooks', f) for f in request.files.getlist('workbooks')]
+    for field, uploaded_file in uploads:
+        workbook, error = read_uploaded_workbook(uploaded_file)
+        if error:
+            return None, error
+        workbooks[workbook['file_name']] = workbook
+        if field == 'workContent':
+            shared = workbook
+    if not workbooks:
+        return None, _bad_request('No file uploaded')
+    if shared is None and len(workbooks) == 1:
+        shared = next(iter(workbooks.values()))
+
+    form_options = request.form.to_dict()
+    lines = []
+    for index, config in enumerate(configs):
+        if not isinstance(config, dict):
+            return None, _bad_request(f'Line {index}: expected an object')
+        workbook = workbooks.get(config['workbook']) if config.get('workbook') else shared
+        if workbook is None:
+            return None, _bad_request(f"Line {index}: unknown or missing workbook '{config.get('workbook', '')}'")
+        models = config.get('models')
+        if not config.get('shift') or not isinstance(models, list) or not models:
+            return None, _bad_request(f'Line {index}: shift and models are required')
+
+        overrides = {
+            field: str(config[field]).lower() if isinstance(config[field], bool) else str(config[field])
+            for field in LINE_OPTION_FIELDS if config.get(field) is not None
+        }
+        try:
+            options = parse_lb_options({**form_options, **overrides})
+            no_of_stations = int(config.get('noOfStations') or 0)
+        except ValueError as e:
+            return None, _bad_request(f'Line {index}: {str(e)}')
+        lines.append({
+            'date': config.get('date'),
+            'shift': config['shift'],
+            'line': config.get('line'),
+            'noOfStations': no_of_stations,
+            'crane_pos': parse_crane_pos(config.get('crane_pos', [])),
+            'models': models,
+            **options,
+            **workbook
+        })
+
+    logger.info("Parsed batch: %d line(s) over %d workbook(s)", len(lines), len(workbooks))
+    return lines, None
+
+
+@lb_batchController_bp.route('/lb-batch', methods=['POST'])
+def lb_batchController():
+    try:
+        lines, error = parse_lb_batch_form()
+        if error:
+            return error
+
+        output = request.form.get('output', '').strip().lower()
+        if not output:
+            output = 'ndjson' if 'application/x-ndjson' in request.headers.get('Accept', '') else 'json'
+        if output not in BATCH_OUTPUTS:
+            return _bad_request(f"Unknown output '{output}'. Expected one of: {', '.join(BATCH_OUTPUTS)}")
+        try:
+            workers = parse_workers(request.form.get('batch_workers'), 'batch_workers')
+        except ValueError as e:
+            return _bad_request(str(e))
+
+        if output == 'json':
+            return jsonify(run_lb_batch(lines, workers))
+
+        # NDJSON: one line per finished configuration, in completion order, then the summary
+        def generate():
+            started = time.perf_counter()
+            items = []
+            for item in iter_lb_batch(lines, workers):
+                items.append(item)
+                yield current_app.json.dumps(item) + '\n'
+            workbooks = {parsed_data['file_name']: parsed_data['content_hash'] for parsed_data in lines}
+            summary = batch_summary(items, workbooks, batch_pool_size(workers, lines), started)
+            yield current_app.json.dumps({'summary': summary}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        error_details = traceback.format_exc()
+        logger.error("ERROR in lb_batchController: %s\n%s", e, error_details)
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'traceback': error_details
+        }), 500
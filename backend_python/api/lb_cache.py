@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+def file_content_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class WorkbookCache:
+    """
+    Parsed model tables keyed by workbook content hash.
+
+    Each entry is ``{'sheet_names': [...], 'models': {model_name: DataFrame}}``.
+    Models are added as they are first requested, so an entry may hold only
+    some of the workbook's ModelData sheets. A size-bounded in-memory LRU sits
+    in front of an optional on-disk Parquet copy, so a repeat upload of the
+    same bytes never reaches the Excel parser again, even after a restart.
+    Cached frames are shared: callers must copy before mutating.
+    """
+
+    def __init__(self, max_entries=16, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._copy(self._entries[key])
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return self._copy(entry)
+
+    def put(self, key, entry):
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'disk_dir': self.disk_dir,
+            }
+
+    @staticmethod
+    def _copy(entry):
+        return {'sheet_names': list(entry['sheet_names']), 'models': dict(entry['models'])}
+
+    def _remember(self, key, entry):
+        self._entries[key] = self._copy(entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ----------------------------
+    # On-disk columnar copy
+    # ----------------------------
+    def _entry_dir(self, key):
+        return os.path.join(self.disk_dir, key)
+
+    @staticmethod
+    def _table_file(name):
+        # Model names may hold characters that are not filename-safe
+        return hashlib.sha1(name.encode('utf-8')).hexdigest()[:16] + '.parquet'
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        manifest_path = os.path.join(self._entry_dir(key), 'models.json')
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path) as fh:
+                manifest = json.load(fh)
+            return {
+                'sheet_names': manifest['sheet_names'],
+                'models': {
+                    name: pd.read_parquet(os.path.join(self._entry_dir(key), self._table_file(name)))
+                    for name in manifest['models']
+                },
+            }
+        except Exception as e:
+            logger.warning("⚠️ Could not read cached workbook %s: %s", key, e)
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        entry_dir = self._entry_dir(key)
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            for name, df in entry['models'].items():
+                path = os.path.join(entry_dir, self._table_file(name))
+                if not os.path.exists(path):
+                    df.to_parquet(path, index=False)
+            # Manifest last: its presence marks the entry as complete
+            with open(os.path.join(entry_dir, 'models.json'), 'w') as fh:
+                json.dump({'sheet_names': entry['sheet_names'], 'models': list(entry['models'].keys())}, fh)
+        except Exception as e:
+            # Mixed-type columns or a missing Parquet engine only cost us the disk copy
+            logger.warning("⚠️ Could not write cached workbook %s: %s", key, e)
+
+
+workbook_cache = WorkbookCache(
+    max_entries=int(os.environ.get('LB_WORKBOOK_CACHE_SIZE', 16)),
+    disk_dir=os.environ.get('LB_WORKBOOK_CACHE_DIR') or None,
+)
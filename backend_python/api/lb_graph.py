@@ -0,0 +1,544 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .lb_stations import StationIndex
+
+
+# Depth cap used by the original breadth-first `make_order`
+MAX_ORDER_DEPTH = 100
+
+# Ancestor ordering strategies understood by balance_task_graph
+ORDERINGS = ('incremental', 'legacy')
+
+# Ordering used when a request does not pick one. 'incremental' levels ties
+# differently, so it can assign tasks to other stations than the original;
+# it stays opt-in until those layouts are signed off
+DEFAULT_ORDERING = 'legacy'
+
+# Finished passes remembered per BalanceContext, by count and by estimated size
+PASS_MEMO_SIZE = 32
+PASS_MEMO_BYTES = int(os.environ.get('LB_PASS_MEMO_BYTES', 32 * 1024 * 1024))
+
+
+class TaskGraph:
+    """
+    Compiled, array-backed view of a single ModelData sheet.
+
+    Built once per model so the balancer never touches the DataFrame inside
+    its loops. Tasks are addressed by row position; ``labels`` maps a position
+    back to the original DataFrame index label.
+    """
+
+    def __init__(self, labels, orders, times, crane, pred_ptr, pred_idx):
+        self.labels = labels              # position -> DataFrame index label
+        self.orders = orders              # position -> 'TOTAL Order' value
+        self.times = times                # float64, 'Time (in minutes)'
+        self.crane = crane                # float64, 'Crane Required' (-1 / 0 / 1 / NaN)
+        self.pred_ptr = pred_ptr          # CSR row pointer, len n + 1
+        self.pred_idx = pred_idx          # CSR predecessor positions
+
+        # Filled in by compute_topology()
+        self.succ_ptr = None              # CSR successor adjacency (reverse of preds)
+        self.succ_idx = None
+        self.topo_rank = None             # position of each task in a topological order
+        self.cyclic = None                # True for tasks whose ordering had to break a cycle
+
+    def __len__(self):
+        return len(self.times)
+
+    def predecessors(self, pos):
+        return self.pred_idx[self.pred_ptr[pos]:self.pred_ptr[pos + 1]]
+
+    @property
+    def skip_mask(self):
+        return self.crane == -1
+
+    @property
+    def total_time(self):
+        # Same as summing 'Time (in minutes)' over rows with Crane Required != -1 (NaN ignored)
+        return float(np.nansum(self.times[~self.skip_mask]))
+
+
+def predecessor_edges(input_data):
+    """
+    Parse the 'Predecessors' column into an edge list in one vectorised pass.
+
+    Returns a DataFrame with one row per distinct (task, predecessor name)
+    pair, in sheet order: ``task`` (row position), ``name`` (the stripped
+    predecessor text) and ``pred`` (row position of that task, or -1 when no
+    row has that 'TOTAL Order'). Names are matched with a single join against
+    'TOTAL Order'; the last row wins on duplicate orders, as the old
+    iterrows() based dict did.
+    """
+    n = len(input_data)
+    raw = pd.Series(input_data['Predecessors'].to_numpy(dtype=object), index=np.arange(n, dtype=np.int64))
+    raw = raw[raw.notna()].astype(str)
+
+    names = raw.str.split(',').explode().str.strip()
+    names = names[names != '']
+    edges = pd.DataFrame({'task': names.index.to_numpy(dtype=np.int64), 'name': names.to_numpy(dtype=object)})
+    # Repeated names in one cell collapse to the first occurrence
+    edges = edges.drop_duplicates(['task', 'name'], ignore_index=True)
+
+    lookup = pd.DataFrame({
+        'name': pd.Series(input_data['TOTAL Order'].to_numpy(dtype=object), dtype=object),
+        'pred': np.arange(n, dtype=np.int64),
+    }).drop_duplicates('name', keep='last')
+    edges = edges.merge(lookup, on='name', how='left', sort=False)
+    edges['pred'] = edges['pred'].fillna(-1).astype(np.int64)
+    return edges
+
+
+def compute_topology(graph):
+    """
+    One-off topological pre-pass over the predecessor graph.
+
+    Stores the successor adjacency and a topological rank of every task.
+    Tasks caught in a cycle are ranked after the acyclic part in row order;
+    edges that point "backwards" in that rank are ignored by the incremental
+    ordering instead of being chased to a depth cap.
+    """
+    n = len(graph)
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(graph.pred_ptr))
+    dst = graph.pred_idx
+
+    # Successor CSR: for every edge pred -> task, group by pred
+    order = np.argsort(dst, kind='stable')
+    succ_idx = src[order]
+    succ_ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(dst, minlength=n), out=succ_ptr[1:])
+
+    # Kahn's algorithm on plain lists
+    indeg = np.diff(graph.pred_ptr).tolist()
+    s_ptr = succ_ptr.tolist()
+    s_idx = succ_idx.tolist()
+    queue = [pos for pos in range(n) if indeg[pos] == 0]
+    for u in queue:
+        for v in s_idx[s_ptr[u]:s_ptr[u + 1]]:
+            indeg[v] -= 1
+            if indeg[v] == 0:
+                queue.append(v)
+
+    cyclic = np.ones(n, dtype=bool)
+    cyclic[queue] = False
+    topo = queue + np.flatnonzero(cyclic).tolist()
+
+    rank = [0] * n
+    for r, pos in enumerate(topo):
+        rank[pos] = r
+
+    graph.succ_ptr = succ_ptr
+    graph.succ_idx = succ_idx
+    graph.topo_rank = np.array(rank, dtype=np.int64)
+    graph.cyclic = cyclic
+    return graph
+
+
+def build_task_graph(input_data, edges=None):
+    """
+    Compile a ModelData DataFrame into a TaskGraph.
+
+    ``edges`` is the output of ``predecessor_edges`` when the caller already
+    has it; predecessors that match no task are left out of the graph.
+    """
+    n = len(input_data)
+    times = pd.to_numeric(input_data['Time (in minutes)'], errors='coerce').to_numpy(dtype=np.float64)
+    crane = pd.to_numeric(input_data['Crane Required'], errors='coerce').to_numpy(dtype=np.float64)
+    orders = input_data['TOTAL Order'].tolist()
+
+    if edges is None:
+        edges = predecessor_edges(input_data)
+    resolved = edges[edges['pred'] >= 0]
+
+    # Edges come grouped by task in sheet order, so they already form the CSR rows
+    pred_ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(resolved['task'].to_numpy(), minlength=n), out=pred_ptr[1:])
+    pred_idx = resolved['pred'].to_numpy(dtype=np.int64)
+
+    graph = TaskGraph(
+        labels=input_data.index.tolist(),
+        orders=orders,
+        times=times,
+        crane=crane,
+        pred_ptr=pred_ptr,
+        pred_idx=pred_idx,
+    )
+    return compute_topology(graph)
+
+
+def _finish_levels(levels):
+    # Sort each level by after_pos
+    for level in levels:
+        level.sort(key=lambda x: x[1])
+
+    # Propagate max position constraint
+    prev_max = -1
+    for idx in range(len(levels)):
+        if idx != 0 and levels[idx]:
+            levels[idx] = [(item[0], max(prev_max, item[1])) for item in levels[idx]]
+        if levels[idx]:
+            prev_max = levels[idx][-1][1]
+
+    return levels
+
+
+class BalanceContext:
+    """
+    Per-model invariants of the balancer, computed once and reused.
+
+    Holds the list views of the graph arrays, the crane / skip task sets and
+    a memo of finished passes. A pass of the convergence loop depends only on
+    the cycle time and the crane layout of its stations, so a pass seen
+    before is replayed from the memo instead of recomputed.
+
+    Iterations of one run always try more stations than the last, so the
+    memo only hits when a context balances the same cycle time and layout
+    again. Building the context (``build_seconds``) is the saving a reused
+    context always gives. The memo keeps at most ``memo_size`` passes and
+    ``memo_bytes`` of estimated pass state; ``memo_size=0`` turns it off.
+    Contexts may be shared between threads; ``last_run`` is per thread.
+    """
+
+    def __init__(self, graph, ordering=DEFAULT_ORDERING, memo_size=PASS_MEMO_SIZE, memo_bytes=PASS_MEMO_BYTES):
+        if ordering not in ORDERINGS:
+            raise ValueError(f"Unknown ordering '{ordering}'. Expected one of: {', '.join(ORDERINGS)}")
+        started = time.perf_counter()
+        self.graph = graph
+        self.ordering = ordering
+        self.memo_size = memo_size
+        self.memo_bytes = memo_bytes
+
+        # Plain lists for the hot loops: scalar indexing on ndarrays is slower than on lists
+        self.times = graph.times.tolist()
+        self.crane = graph.crane.tolist()
+        self.ptr = graph.pred_ptr.tolist()
+        self.preds = graph.pred_idx.tolist()
+        self.s_ptr = graph.succ_ptr.tolist()
+        self.succs = graph.succ_idx.tolist()
+        self.rank = graph.topo_rank.tolist()
+        self.skip_done = graph.skip_mask.tolist()
+        self.skip_tasks = set(np.flatnonzero(graph.skip_mask).tolist())
+        self.crane_req_index = np.flatnonzero(graph.crane == 1).tolist()
+        self.total_time = graph.total_time
+
+        self._passes = OrderedDict()
+        self._memo_used = 0
+        self.runs = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Scratch space for pass implementations (e.g. per-graph priority weights)
+        self.extras = {}
+        self.build_seconds = time.perf_counter() - started
+
+    @property
+    def last_run(self):
+        return getattr(self._local, 'last_run', None)
+
+    @last_run.setter
+    def last_run(self, value):
+        self._local.last_run = value
+
+    def start_run(self):
+        """Count a run on this context; True if an earlier run already used its preprocessing."""
+        with self._lock:
+            self.runs += 1
+            return self.runs > 1
+
+    def lookup(self, key):
+        with self._lock:
+            entry = self._passes.get(key)
+            if entry is None:
+                return None
+            self._passes.move_to_end(key)
+            return entry[0]
+
+    def remember(self, key, state):
+        if self.memo_size <= 0:
+            return
+        size = _state_bytes(state)
+        if size > self.memo_bytes:
+            return
+        with self._lock:
+            if key in self._passes:
+                self._memo_used -= self._passes.pop(key)[1]
+            self._passes[key] = (state, size)
+            self._memo_used += size
+            while len(self._passes) > self.memo_size or self._memo_used > self.memo_bytes:
+                _, (_, evicted) = self._passes.popitem(last=False)
+                self._memo_used -= evicted
+
+
+def _state_bytes(state):
+    # Rough CPython footprint of a pass state: list slots plus boxed floats / ints
+    time_rem, crane_aval, task_order, done, _ = state
+    placed = sum(len(tasks) for tasks in task_order)
+    return 64 * len(time_rem) + 56 * len(task_order) + 36 * placed + 8 * (len(crane_aval) + len(done))
+
+
+def _balance_pass(ctx, cycle_time_param, crane_aval):
+    """
+    One greedy pass over every task for a fixed initial station layout.
+
+    Returns ``(time_rem, crane_aval, task_order, done, counters)`` for the
+    stations the pass ended up with (it may append stations to the initial
+    layout); ``counters`` reports the placement work the pass did.
+    """
+    n = len(ctx.times)
+    times = ctx.times
+    crane = ctx.crane
+    ptr = ctx.ptr
+    preds = ctx.preds
+    s_ptr = ctx.s_ptr
+    succs = ctx.succs
+    rank = ctx.rank
+    skip_tasks = ctx.skip_tasks
+
+    # Skipped tasks (Crane Required == -1) count as done
+    done = list(ctx.skip_done)
+    station_placed = [-1] * n
+    # Highest station any placed predecessor sits on (-1 = unconstrained)
+    bound = [-1] * n
+
+    stations = StationIndex([cycle_time_param] * len(crane_aval), crane_aval)
+    task_order = [[] for _ in range(len(crane_aval))]
+
+    in_p = 0
+
+    # ----------------------------
+    # Nested helper: make_order()
+    # ----------------------------
+    def make_order_incremental(i):
+        # Unplaced ancestor closure in breadth-first discovery order
+        closure = [i]
+        seen = {i}
+        for j in closure:
+            for p in preds[ptr[j]:ptr[j + 1]]:
+                if not done[p] and p not in seen:
+                    seen.add(p)
+                    closure.append(p)
+
+        # Longest path from i, walking the closure against topological order. It
+        # depends on i and on what is still unplaced, so no global level can stand in
+        depth = dict.fromkeys(closure, 0)
+        for j in sorted(closure, key=rank.__getitem__, reverse=True):
+            next_level = depth[j] + 1
+            for p in preds[ptr[j]:ptr[j + 1]]:
+                if p in seen and rank[p] < rank[j] and depth[p] < next_level:
+                    depth[p] = next_level
+
+        levels = [[] for _ in range(max(depth.values()) + 1)]
+        for key in closure:
+            levels[depth[key]].append((key, bound[key]))
+        return _finish_levels(levels)
+
+    def make_order_legacy(i):
+        element_dict = {}
+        old_list = [i]
+        curr_level = 0
+
+        while len(old_list) > 0 and curr_level <= MAX_ORDER_DEPTH:
+            new_list = []
+            for j in old_list:
+                max_done = -1
+                for p in preds[ptr[j]:ptr[j + 1]]:
+                    if done[p]:
+                        station = station_placed[p]
+                        if station != -1:
+                            max_done = max(max_done, station)
+                    elif p not in skip_tasks:
+                        new_list.append(p)
+
+                if j in element_dict:
+                    entry = element_dict[j]
+                    entry[0] = max(entry[0], curr_level)
+                    entry[1] = max(entry[1], max_done)
+                else:
+                    element_dict[j] = [curr_level, max_done]
+
+            curr_level += 1
+            old_list = list(set(new_list))  # Remove duplicates
+
+        levels = [[] for _ in range(curr_level)]
+        for key, (level, after_pos) in element_dict.items():
+            levels[level].append((key, after_pos))
+        return _finish_levels(levels)
+
+    make_order = make_order_legacy if ctx.ordering == 'legacy' else make_order_incremental
+
+    # ----------------------------
+    # Helper: place_the_items() - first-fit placement of an ordered closure
+    # ----------------------------
+    def place_the_items(order_level, check_crane):
+        nonlocal in_p
+        for level in order_level:
+            for task_idx, min_station in level:
+                if done[task_idx]:
+                    continue
+
+                task_time = times[task_idx]
+                needs_crane = check_crane and crane[task_idx] == 1
+
+                final_pos = max(min_station, in_p) if min_station >= 0 else in_p
+
+                # First station at or after final_pos with room (and a crane if needed)
+                w = stations.first_fit(final_pos, task_time, needs_crane)
+                if w >= 0:
+                    task_order[w].append(task_idx)
+                    stations.place(w, task_time)
+                    in_p = max(in_p, w)
+                else:
+                    # If not placed, add new station
+                    w = in_p = stations.add_station(1 if needs_crane else 0, cycle_time_param - task_time)
+                    task_order.append([task_idx])
+
+                done[task_idx] = True
+                station_placed[task_idx] = w
+
+                # Push the earliest-station bound to direct successors only
+                for v in succs[s_ptr[task_idx]:s_ptr[task_idx + 1]]:
+                    if bound[v] < w:
+                        bound[v] = w
+
+    # --- Process crane-required tasks first ---
+    for i in ctx.crane_req_index:
+        if not done[i]:
+            place_the_items(make_order(i), check_crane=True)
+
+    # --- Process remaining non-crane tasks ---
+    # Candidates are fixed before the pass, as the old iterrows() snapshot was
+    in_p = 0
+    for index in [j for j in range(n) if crane[j] == 0 and not done[j]]:
+        place_the_items(make_order(index), check_crane=False)
+
+    counters = {
+        'tasks_placed': sum(done) - len(skip_tasks),
+        'stations_added': len(stations) - len(crane_aval),
+        'placement_lookups': stations.lookups,
+        'stations_scanned': stations.scanned,
+        'tree_lookups': stations.tree_lookups,
+    }
+    return stations.time_rem, stations.crane_aval, task_order, done, counters
+
+
+def balance_task_graph(graph, cycle_time_param, noOfStations_param, crane_pos_param,
+                       ordering=DEFAULT_ORDERING, on_iteration=None, context=None, warm_start=True,
+                       station_pass=None):
+    """
+    Run the greedy line balancing on a compiled TaskGraph.
+
+    ``ordering`` selects how the unplaced ancestors of a task are levelled:
+
+    - ``'legacy'`` (default) replays the original breadth-first walk,
+      including its 100-level cap and set-based tie order, so layouts match
+      older results exactly.
+    - ``'incremental'`` uses the topological pre-pass and an earliest-station
+      bound that is pushed to direct successors whenever a task is placed.
+      Work is linear in the closure and there is no depth cap, but ties are
+      levelled in a different order, so tasks can land on other stations.
+
+    ``context`` is a BalanceContext for this graph and ordering; pass the same
+    one to repeated calls (e.g. a scenario sweep) to share the preprocessing
+    and, if it has one, the pass memo. With ``warm_start`` off the memo is
+    neither read nor filled and every pass is recomputed, as the original
+    loop did. Either way the result is identical. Iteration count,
+    per-iteration seconds, memo hits, the context's build time and whether
+    an earlier run already paid for it are left in ``context.last_run``, together with the summed placement
+    counters of the passes that were computed.
+
+    ``station_pass(context, cycle_time, crane_aval)`` replaces the greedy
+    first-fit pass (see ``lb_strategies``); it must return the same state
+    tuple as ``_balance_pass``. The convergence loop, crane shifting and memo
+    are shared by every pass.
+
+    ``on_iteration(iteration, stations)``, if given, is called after every
+    pass of the convergence loop with the number of stations that pass used.
+
+    Returns ``(solution, done)`` where ``solution`` is the list of station
+    dicts (``task_order`` holds DataFrame index labels) and ``done`` is the
+    final per-task placement flag array.
+    """
+    if context is None:
+        context = BalanceContext(graph, ordering)
+    elif context.graph is not graph or context.ordering != ordering:
+        raise ValueError('BalanceContext was built for a different graph or ordering')
+
+    if station_pass is None:
+        station_pass = _balance_pass
+
+    context_reused = context.start_run()
+    stations_required = int(np.ceil(context.total_time / cycle_time_param))
+    check_done = 1
+    count = 1
+    curr_stations = max(noOfStations_param, stations_required)
+
+    final_state = None
+    iteration_seconds = []
+    memo_hits = 0
+    # Placement work summed over the passes actually computed (memo replays cost nothing)
+    counters = {}
+
+    while check_done and count < 10:
+        started = time.perf_counter()
+        crane_pos_list = list(crane_pos_param)
+
+        # Adjust crane positions if we need more stations
+        if curr_stations > noOfStations_param:
+            diff = curr_stations - noOfStations_param
+            crane_pos_list = list(range(1, diff + 1)) + [pos + diff for pos in crane_pos_list]
+
+        # Initialize station list
+        crane_aval = [0] * curr_stations
+        for i in crane_pos_list:
+            if 0 <= i - 1 < curr_stations:
+                crane_aval[i - 1] = 1
+
+        # The pass is fully determined by the pass kind, the cycle time and the initial layout
+        key = (station_pass.__name__, cycle_time_param, tuple(crane_aval))
+        state = context.lookup(key) if warm_start else None
+        if state is None:
+            state = station_pass(context, cycle_time_param, crane_aval)
+            if warm_start:
+                context.remember(key, state)
+            for name, value in state[4].items():
+                counters[name] = counters.get(name, 0) + value
+        else:
+            memo_hits += 1
+        iteration_seconds.append(round(time.perf_counter() - started, 6))
+
+        station_count = len(state[0])
+        if on_iteration is not None:
+            on_iteration(count, station_count)
+
+        # Check convergence
+        final_state = state
+        if curr_stations < station_count:
+            curr_stations = station_count
+        else:
+            check_done = 0
+
+        count += 1
+
+    context.last_run = {
+        'iterations': count - 1,
+        'iteration_seconds': iteration_seconds,
+        'memo_hits': memo_hits,
+        'preprocess_seconds': round(context.build_seconds, 6),
+        'context_reused': context_reused,
+        'converged': not check_done,
+        'counters': counters,
+    }
+
+    time_rem, crane_aval, task_order, done, _ = final_state
+    labels = graph.labels
+    solution = [
+        {"crane_aval": crane_aval[w],
+         "task_order": [labels[t] for t in task_order[w]],
+         "time_rem": time_rem[w]}
+        for w in range(len(time_rem))
+    ]
+    return solution, np.array(done, dtype=bool)
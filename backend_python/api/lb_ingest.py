@@ -0,0 +1,195 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .lb_graph import BalanceContext, build_task_graph, predecessor_edges
+
+
+logger = logging.getLogger(__name__)
+
+# How precedence problems are handled: reported alongside the result, or fatal
+VALIDATION_MODES = ('warn', 'strict')
+
+
+class ModelIngest:
+    """Compiled TaskGraph of one model plus the precedence problems found while building it."""
+
+    def __init__(self, graph, errors):
+        self.graph = graph
+        self.errors = errors
+        self._contexts = {}
+        self._lock = threading.Lock()
+
+    def context(self, ordering):
+        """
+        The BalanceContext of this graph for ``ordering``, created once.
+
+        Every run on the same workbook shares its preprocessing. It has no
+        pass memo: a cached entry then costs about one more copy of the graph,
+        not a set of pass states (repeat runs are the result cache's job).
+        """
+        with self._lock:
+            if ordering not in self._contexts:
+                self._contexts[ordering] = BalanceContext(self.graph, ordering, memo_size=0)
+            return self._contexts[ordering]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def find_cycles(graph):
+    """
+    Strongly connected components that form a cycle (size > 1, or a self-loop).
+
+    Only tasks Kahn's pass could not order are searched, so an acyclic sheet
+    costs nothing here. Iterative Tarjan over the predecessor edges.
+    """
+    candidates = np.flatnonzero(graph.cyclic).tolist()
+    if not candidates:
+        return []
+
+    in_scope = set(candidates)
+    ptr = graph.pred_ptr.tolist()
+    preds = graph.pred_idx.tolist()
+    index, low, on_stack = {}, {}, set()
+    stack, components = [], []
+    counter = 0
+
+    for root in candidates:
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack.add(v)
+            neighbours = preds[ptr[v]:ptr[v + 1]]
+            while i < len(neighbours):
+                w = neighbours[i]
+                i += 1
+                if w not in in_scope:
+                    continue
+                if w not in index:
+                    work.append((v, i))
+                    work.append((w, 0))
+                    break
+                if w in on_stack:
+                    low[v] = min(low[v], index[w])
+            else:
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        component.append(w)
+                        if w == v:
+                            break
+                    if len(component) > 1 or v in neighbours:
+                        components.append(sorted(component))
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[v])
+    return sorted(components)
+
+
+def ingest_model(df):
+    """
+    Parse, resolve and validate the precedence graph of one ModelData table.
+
+    Errors are structured dicts: ``dangling_predecessor`` for a predecessor
+    name that matches no 'TOTAL Order' (the balancer ignores it), and
+    ``cycle`` for tasks that depend on each other (the balancer breaks the
+    cycle in row order). ``excel_row`` is the 1-based sheet row, header
+    included.
+    """
+    edges = predecessor_edges(df)
+    graph = build_task_graph(df, edges=edges)
+    orders = graph.orders
+    errors = []
+
+    dangling = edges[edges['pred'] < 0]
+    for task, name in zip(dangling['task'].tolist(), dangling['name'].tolist()):
+        errors.append({
+            'type': 'dangling_predecessor',
+            'row': task,
+            'excel_row': task + 2,
+            'task': orders[task],
+            'predecessor': name,
+        })
+
+    for component in find_cycles(graph):
+        errors.append({
+            'type': 'cycle',
+            'rows': component,
+            'excel_rows': [row + 2 for row in component],
+            'tasks': [orders[row] for row in component],
+        })
+
+    return ModelIngest(graph, errors)
+
+
+class IngestCache:
+    """
+    ModelIngest results keyed by ``(workbook content hash, model name)``.
+
+    The ingest stage then runs once per workbook: repeat uploads, sweeps and
+    jobs on the same bytes reuse the compiled graphs. Graphs are read-only
+    once built, so entries are shared without copying.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, content_hash, name, df):
+        key = (content_hash, name)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        ingested = ingest_model(df)
+        with self._lock:
+            self._entries[key] = ingested
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return ingested
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def ingest_models(content_hash, model_dfs):
+    """``{name: ModelIngest}`` for every model, from the ingest cache where possible."""
+    ingested = {}
+    for name, df in model_dfs.items():
+        ingested[name] = ingest_cache.get_or_build(content_hash, name, df)
+        if ingested[name].errors:
+            logger.warning("⚠️ %s: %d precedence problem(s) in the sheet", name, len(ingested[name].errors))
+    return ingested
+
+
+ingest_cache = IngestCache(max_entries=int(os.environ.get('LB_INGEST_CACHE_SIZE', 64)))
@@ -0,0 +1,73 @@
+from flask import Blueprint, jsonify, url_for
+from .lb import process_lb_file
+from .lb_jobs import JobQueueFull, job_manager
+from .lb_uploadController import parse_lb_upload_form
+import logging
+import traceback
+
+lb_jobController_bp = Blueprint('lb_jobController_bp', __name__)
+logger = logging.getLogger(__name__)
+
+
+@lb_jobController_bp.route('/lb-jobs', methods=['POST'])
+def submit_lb_jobController():
+    try:
+        parsed_data, error = parse_lb_upload_form()
+        if error:
+            return error
+
+        job = job_manager.submit(process_lb_file, parsed_data)
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('lb_jobController_bp.lb_job_statusController', job_id=job.id),
+            'result_url': url_for('lb_jobController_bp.lb_job_resultController', job_id=job.id)
+        }), 202
+
+    except JobQueueFull as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
+
+    except Exception as e:
+        error_details = traceback.format_exc()
+        logger.error("ERROR in submit_lb_jobController: %s\n%s", e, error_details)
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'traceback': error_details
+        }), 500
+
+
+@lb_jobController_bp.route('/lb-jobs/<job_id>', methods=['GET'])
+def lb_job_statusController(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown or expired job: {job_id}'
+        }), 404
+
+    return jsonify(dict(job.to_dict(), success=True))
+
+
+@lb_jobController_bp.route('/lb-jobs/<job_id>/result', methods=['GET'])
+def lb_job_resultController(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown or expired job: {job_id}'
+        }), 404
+
+    if job.status in ('queued', 'running'):
+        # Not ready yet: hand back the status so clients can keep polling
+        return jsonify(dict(job.to_dict(), success=True)), 202
+
+    if job.result.get('errors'):
+        # Strict precedence validation rejected the workbook, as /lb-upload reports it
+        return jsonify(job.result), 400
+
+    return jsonify(job.result), 200 if job.status == 'done' else 500
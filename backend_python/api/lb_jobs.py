@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(Exception):
+    """Raised when too many line-balancing jobs are already waiting."""
+
+
+class LBJob:
+    """State of one background line-balancing run."""
+
+    def __init__(self, job_id, params):
+        self.id = job_id
+        self.params = params
+        self.status = 'queued'           # queued -> running -> done | failed
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.phase = None
+        self.models = {}                 # model -> {'status', 'iteration', 'stations', 'seconds'}
+        self.result = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def on_progress(self, event, **info):
+        # Called from the worker thread through process_lb_file(progress=...)
+        with self._lock:
+            self._apply(event, info)
+
+    def _apply(self, event, info):
+        if event == 'phase':
+            self.phase = info['phase']
+            for name in info.get('models', []):
+                self.models.setdefault(name, {'status': 'pending', 'iteration': 0, 'stations': None})
+        elif event == 'model_started':
+            self.models.setdefault(info['model'], {'iteration': 0, 'stations': None})['status'] = 'running'
+        elif event == 'iteration':
+            state = self.models.setdefault(info['model'], {'status': 'running'})
+            state['iteration'] = info['iteration']
+            state['stations'] = info['stations']
+        elif event == 'model_finished':
+            state = self.models.setdefault(info['model'], {'iteration': 0, 'stations': None})
+            state['status'] = 'done'
+            state['seconds'] = round(info['seconds'], 4)
+
+    def to_dict(self):
+        with self._lock:
+            models = {name: dict(state) for name, state in self.models.items()}
+        finished = sum(1 for state in models.values() if state.get('status') == 'done')
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'phase': self.phase,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'progress': {
+                'models_done': finished,
+                'models_total': len(models),
+                'models': models,
+            },
+            'error': self.error,
+        }
+
+
+class JobManager:
+    """
+    Bounded background executor for line-balancing runs.
+
+    At most ``max_workers`` runs execute at once and at most ``max_pending``
+    wait in the queue; finished jobs (and their results) are kept for
+    ``result_ttl`` seconds and then dropped.
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, result_ttl=3600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lb-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, params):
+        """Queue ``func(params, progress=...)`` and return the new LBJob."""
+        with self._lock:
+            self._purge_expired()
+            pending = sum(1 for job in self._jobs.values() if job.status == 'queued')
+            if pending >= self.max_pending:
+                raise JobQueueFull(f'Too many queued jobs ({pending}), try again later')
+            job = LBJob(uuid.uuid4().hex, params)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            result = func(job.params, progress=job.on_progress)
+        except Exception as e:
+            result = {'success': False, 'message': str(e), 'traceback': traceback.format_exc()}
+
+        # process_lb_file reports its own failures in the result payload
+        job.result = result
+        job.error = None if result.get('success') else result.get('message')
+        job.finished_at = time.time()
+        job.status = 'done' if result.get('success') else 'failed'
+        # Status polls should not keep reporting the last phase the run was in
+        job.phase = job.status
+        # In-memory uploads can be large; the finished job only needs its result
+        job.params = None
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager(
+    max_workers=int(os.environ.get('LB_JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('LB_JOB_MAX_PENDING', 32)),
+    result_ttl=float(os.environ.get('LB_JOB_RESULT_TTL', 3600)),
+)
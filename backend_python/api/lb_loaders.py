@@ -0,0 +1,348 @@
+import io
+import logging
+import os
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+
+logger = logging.getLogger(__name__)
+
+
+# Columns the balancer and post-processing actually read
+MODEL_COLUMNS = ['TOTAL Order', 'Steps', 'Time (in minutes)', 'Crane Required', 'Predecessors', 'Manpower (19)']
+
+MODEL_SHEET_PATTERN = re.compile(r"ModelData_(.+)")
+
+# Extensions openpyxl can stream in read-only mode
+OPENPYXL_EXTENSIONS = {'.xlsx', '.xlsm', '.xltx', '.xltm'}
+
+EXCEL_EXTENSIONS = OPENPYXL_EXTENSIONS | {'.xls'}
+
+# Flat tables: one model per file (named after the file), or several with a 'Model' column
+TABLE_EXTENSIONS = {'.csv', '.parquet', '.feather'}
+
+# Every upload type load_models understands; '.zip' holds per-model tables
+SUPPORTED_EXTENSIONS = EXCEL_EXTENSIONS | TABLE_EXTENSIONS | {'.zip'}
+
+# Optional column naming the model of each row in a flat table
+MODEL_NAME_COLUMN = 'Model'
+
+# Explicit types for flat tables, so they load the same whatever the writer inferred
+MODEL_DTYPES = {
+    'TOTAL Order': 'string',
+    'Steps': 'string',
+    'Time (in minutes)': 'float64',
+    'Crane Required': 'float64',
+    'Predecessors': 'string',
+    'Manpower (19)': 'float64',
+}
+
+
+def normalize_model_table(df):
+    """Keep only the columns the pipeline uses, in a fixed order."""
+    return df[[col for col in MODEL_COLUMNS if col in df.columns]].reset_index(drop=True)
+
+
+def safe_model_name(model_name):
+    # Replace invalid chars (like '.') with '_' for valid variable name
+    return model_name.replace('.', '_')
+
+
+def select_model_sheets(sheet_names, models=None):
+    """
+    Split sheet names into the ``ModelData_<name>`` sheets to load and the rest.
+
+    ``models`` is the set of requested model names; a sheet matches on either
+    its raw or its safe name. With no models requested every ModelData sheet
+    is selected. Returns ``(selected, skipped)`` where ``selected`` is a list
+    of ``(sheet_name, safe_name)`` pairs in workbook order.
+    """
+    selected, skipped = [], []
+    for sheet_name in sheet_names:
+        match = MODEL_SHEET_PATTERN.match(sheet_name)
+        if not match:
+            skipped.append(sheet_name)
+            continue
+        model_name = match.group(1)
+        safe_name = safe_model_name(model_name)
+        if models and model_name not in models and safe_name not in models:
+            skipped.append(sheet_name)
+            continue
+        selected.append((sheet_name, safe_name))
+    return selected, skipped
+
+
+def _convert_cell(cell):
+    # Same conversions pandas' openpyxl reader applies
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    if cell.value is None:
+        return ""
+    elif cell.data_type == TYPE_ERROR:
+        return np.nan
+    elif cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    return cell.value
+
+
+def _stream_sheet(sheet, columns):
+    """
+    Stream a read-only worksheet, keeping only ``columns`` from each row.
+
+    Only the projected cells are held in memory. Trailing empty rows are
+    trimmed against the full row, and the projected rows go through the same
+    TextParser settings as ``pd.read_excel``, so values and dtypes match a
+    full read followed by column selection.
+    """
+    sheet.reset_dimensions()
+    rows = sheet.iter_rows()
+
+    header = [_convert_cell(cell) for cell in next(rows, ())]
+    positions = []
+    for col in columns:
+        if col in header:
+            positions.append(header.index(col))
+    names = [header[pos] for pos in positions]
+
+    data = [names]
+    last_row_with_data = 0
+    for row_number, row in enumerate(rows, start=1):
+        width = len(row)
+        if any(cell.value is not None and cell.value != "" for cell in row):
+            last_row_with_data = row_number
+        data.append([_convert_cell(row[pos]) if pos < width else "" for pos in positions])
+
+    # Trim trailing empty rows
+    data = data[:last_row_with_data + 1]
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+
+def _open_source(source):
+    # In-memory uploads arrive as bytes; each read gets its own buffer
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def _load_with_openpyxl(excel_path, models):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(_open_source(excel_path), read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet_names = list(workbook.sheetnames)
+        selected, _ = select_model_sheets(sheet_names, models)
+        model_dfs = {}
+        for sheet_name, safe_name in selected:
+            model_dfs[safe_name] = normalize_model_table(_stream_sheet(workbook[sheet_name], MODEL_COLUMNS))
+            logger.info("✅ Created DataFrame: %s (from sheet: %s)", safe_name, sheet_name)
+    finally:
+        workbook.close()
+    return model_dfs, sheet_names
+
+
+def _load_with_pandas(excel_path, models):
+    with pd.ExcelFile(_open_source(excel_path)) as excel:
+        sheet_names = list(excel.sheet_names)
+        selected, _ = select_model_sheets(sheet_names, models)
+        model_dfs = {}
+        for sheet_name, safe_name in selected:
+            df = excel.parse(sheet_name, usecols=lambda col: col in MODEL_COLUMNS)
+            model_dfs[safe_name] = normalize_model_table(df)
+            logger.info("✅ Created DataFrame: %s (from sheet: %s)", safe_name, sheet_name)
+    return model_dfs, sheet_names
+
+
+def load_excel_models(excel_path, models=None, filename=None):
+    """
+    Load only the ModelData sheets matching ``models``, and only their used columns.
+
+    ``excel_path`` is a path, or the workbook's bytes when the upload was
+    kept in memory; ``filename`` then supplies the extension.
+
+    Returns ``(model_dfs, sheet_names)`` where ``sheet_names`` lists every
+    sheet in the workbook, read or not.
+    """
+    ext = os.path.splitext(filename or excel_path)[1].lower()
+    if ext in OPENPYXL_EXTENSIONS:
+        return _load_with_openpyxl(excel_path, models)
+    return _load_with_pandas(excel_path, models)
+
+
+def table_sheet_name(filename):
+    """Workbook-style sheet name for a flat table: its file stem, prefixed with 'ModelData_' if needed."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem if MODEL_SHEET_PATTERN.match(stem) else f'ModelData_{stem}'
+
+
+def _coerce_model_table(df):
+    """
+    Apply MODEL_DTYPES to a flat table.
+
+    Text columns become plain object columns holding ``str`` values (missing
+    cells stay NaN), which is what the Excel readers produce, so orders and
+    predecessor names compare the same way whatever the source format.
+    """
+    for col, dtype in MODEL_DTYPES.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'string':
+            values = df[col]
+            df[col] = values.astype(str).astype(object).where(values.notna(), np.nan)
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return normalize_model_table(df)
+
+
+def _split_models(df, sheet_name, all_models=None):
+    """
+    ``{sheet_name: table}`` of one flat table, split on the 'Model' column when it has one.
+
+    ``all_models`` lists every model in the file when only some were read;
+    the others are listed with no table.
+    """
+    if MODEL_NAME_COLUMN not in df.columns:
+        return {sheet_name: df}
+    tables = {f'ModelData_{model_name}': None for model_name in all_models or []}
+    for model_name, rows in df.groupby(MODEL_NAME_COLUMN, sort=False):
+        tables[f'ModelData_{model_name}'] = rows
+    return tables
+
+
+def _read_csv(source, columns=None):
+    wanted = set(MODEL_COLUMNS) | {MODEL_NAME_COLUMN}
+    dtypes = {col: (object if dtype == 'string' else dtype) for col, dtype in MODEL_DTYPES.items()}
+    try:
+        return pd.read_csv(source, usecols=lambda col: col in wanted, dtype=dtypes, float_precision='round_trip')
+    except ValueError:
+        # A numeric column with stray text: read it untyped and coerce
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return pd.read_csv(source, usecols=lambda col: col in wanted, dtype=object)
+
+
+def _read_columnar(source, ext, models):
+    """
+    Read the used columns of a Parquet or Feather file with pyarrow.
+
+    Only MODEL_COLUMNS (and 'Model') are read; with a 'Model' column and
+    requested ``models``, Parquet rows of other models are filtered out while
+    reading. Returns ``(df, all_models)``, ``all_models`` being every model
+    in the file when the read was filtered, else ``None``.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as parquet
+
+    # Schemas come from the file footer; no column data is read to pick the columns
+    if ext == '.parquet':
+        schema = parquet.read_schema(_open_source(source))
+    else:
+        schema = ipc.open_file(_open_source(source)).schema
+    columns = [col for col in MODEL_COLUMNS + [MODEL_NAME_COLUMN] if col in schema.names]
+
+    all_models = None
+    if ext == '.parquet':
+        filters = None
+        # Model names are matched as text, so only a text column can be filtered on
+        if models and MODEL_NAME_COLUMN in columns and pa.types.is_string(schema.field(MODEL_NAME_COLUMN).type):
+            # The model column alone is cheap to scan and keeps the full model list for the sheet report
+            model_column = parquet.read_table(_open_source(source), columns=[MODEL_NAME_COLUMN]).column(0)
+            all_models = pd.unique(model_column.to_pandas()).tolist()
+            # Requests may use the raw or the safe name (as select_model_sheets does); filter on raw values
+            wanted = [name for name in all_models
+                      if name is not None and (name in models or safe_model_name(name) in models)]
+            filters = pc.field(MODEL_NAME_COLUMN).isin(pa.array(wanted, type=pa.string()))
+        table = parquet.read_table(_open_source(source), columns=columns, filters=filters)
+    else:
+        table = feather.read_table(_open_source(source), columns=columns, memory_map=False)
+    return table.to_pandas(), all_models
+
+
+def _read_table(source, ext, models):
+    if ext == '.csv':
+        return _read_csv(_open_source(source)), None
+    return _read_columnar(source, ext, models)
+
+
+def _select_tables(tables, sheet_names, models):
+    selected, _ = select_model_sheets(sheet_names, models)
+    model_dfs = {}
+    for sheet_name, safe_name in selected:
+        if tables[sheet_name] is None:
+            # Listed but not read (filtered out or never decompressed)
+            continue
+        model_dfs[safe_name] = _coerce_model_table(tables[sheet_name].drop(columns=[MODEL_NAME_COLUMN],
+                                                                           errors='ignore'))
+        logger.info("✅ Created DataFrame: %s (from table: %s)", safe_name, sheet_name)
+    return model_dfs
+
+
+def load_table_models(source, filename, models=None):
+    """
+    Load a flat model table (CSV, Parquet or Feather) like a one-sheet workbook.
+
+    The table is model ``<file stem>``, unless it has a 'Model' column, in
+    which case each distinct value is a model of its own.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    df, all_models = _read_table(source, ext, models)
+    tables = _split_models(df, table_sheet_name(filename), all_models)
+    sheet_names = list(tables)
+    return _select_tables(tables, sheet_names, models), sheet_names
+
+
+def load_zip_models(source, models=None):
+    """
+    Load a zip archive of per-model tables (CSV, Parquet or Feather members).
+
+    Each member is one model, named after its file like a sheet (see
+    ``table_sheet_name``); members of other types are ignored.
+    """
+    with zipfile.ZipFile(_open_source(source)) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not os.path.basename(info.filename).startswith('.')
+            and not info.filename.startswith('__MACOSX/')
+            and os.path.splitext(info.filename)[1].lower() in TABLE_EXTENSIONS
+        ]
+        tables = {}
+        for info in members:
+            sheet_name = table_sheet_name(info.filename)
+            selected, _ = select_model_sheets([sheet_name], models)
+            # Members of models nobody asked for are listed but never decompressed
+            tables[sheet_name] = None
+            if selected:
+                ext = os.path.splitext(info.filename)[1].lower()
+                tables[sheet_name], _ = _read_table(archive.read(info), ext, None)
+
+    sheet_names = list(tables)
+    return _select_tables(tables, sheet_names, models), sheet_names
+
+
+def load_models(source, models=None, filename=None):
+    """
+    Load the requested model tables from any supported upload.
+
+    Excel workbooks, zipped per-model tables and flat CSV / Parquet / Feather
+    tables all come back as ``(model_dfs, sheet_names)`` with the same
+    normalized columns, so everything downstream is format-agnostic.
+    """
+    filename = filename or source
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported file type '{ext}'. Allowed: {', '.join(sorted(SUPPORTED_EXTENSIONS))}")
+    if ext == '.zip':
+        return load_zip_models(source, models)
+    if ext in TABLE_EXTENSIONS:
+        return load_table_models(source, filename, models)
+    return load_excel_models(source, models, filename)
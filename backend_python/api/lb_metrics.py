@@ -0,0 +1,76 @@
+import cProfile
+import io
+import logging
+import pstats
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+# Functions listed in a per-request profile report
+PROFILE_TOP = 30
+
+
+class RunMetrics:
+    """Phase timers and counters for one request, returned in the response metadata."""
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = round(self.phases.get(name, 0.0) + elapsed, 6)
+            logger.debug("⏱️ %s took %.4fs", name, elapsed)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_counters(self, counters):
+        for name, value in counters.items():
+            self.count(name, value)
+
+    def to_dict(self):
+        return {'phases': dict(self.phases), 'counters': dict(self.counters)}
+
+
+@contextmanager
+def profiled(enabled, top=PROFILE_TOP):
+    """
+    Run the block under cProfile when ``enabled``.
+
+    Yields a dict that is filled in when the block exits with the
+    ``top`` functions by cumulative time. Only one profiler can be active
+    per process, so a request that asks while another is being profiled
+    gets an ``error`` entry instead. Work done in worker processes
+    (``parallel`` runs) is not covered.
+    """
+    report = {}
+    if not enabled:
+        yield report
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        report['error'] = str(e)
+        yield report
+        return
+
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out).sort_stats('cumulative')
+        stats.print_stats(top)
+        report['total_calls'] = stats.total_calls
+        report['total_seconds'] = round(stats.total_tt, 6)
+        report['cumulative'] = out.getvalue()
@@ -0,0 +1,199 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .lb_graph import DEFAULT_ORDERING, TaskGraph, compute_topology
+from .lb_ingest import find_cycles
+from .lb_loaders import safe_model_name
+from .lb_strategies import run_strategies
+
+
+# How the requested models are laid out: one layout each, or one shared mixed-model line
+BALANCING_MODES = ('per_model', 'mixed')
+
+
+class MixedGraph:
+    """
+    Joint precedence graph of several models sharing one line.
+
+    Tasks are identified across sheets by 'TOTAL Order' (the n-th row with a
+    given order in one sheet matches the n-th row with that order in
+    another). ``row_maps[model]`` gives the joint position of every row of
+    that model.
+    """
+
+    def __init__(self, graph, row_maps, members, quantities):
+        self.graph = graph
+        self.row_maps = row_maps
+        self.members = members            # joint position -> number of models using the task
+        self.quantities = quantities
+
+
+def _task_keys(orders, model_idx):
+    # Rows without an order can never be matched across sheets
+    seen = {}
+    keys = []
+    for pos, order in enumerate(orders):
+        if order is None or (isinstance(order, float) and math.isnan(order)):
+            keys.append(('row', model_idx, pos))
+            continue
+        occurrence = seen.get(order, 0)
+        seen[order] = occurrence + 1
+        keys.append((order, occurrence))
+    return keys
+
+
+def build_mixed_graph(graphs, quantities):
+    """
+    Merge per-model TaskGraphs into one quantity-weighted TaskGraph.
+
+    A joint task's time is its quantity-weighted mean time per unit over the
+    whole mix (models without the task, or that skip it, contribute 0), so a
+    station's load is the average work it sees per unit. A task needs a crane if any model
+    needs one there, and is skipped only if every model that has it skips
+    it. Precedence edges are the union of every model's resolved edges.
+    """
+    total_quantity = float(sum(quantities[name] for name in graphs))
+    key_index = {}
+    orders = []
+    row_maps = {}
+    for model_idx, (name, graph) in enumerate(graphs.items()):
+        row_map = np.empty(len(graph), dtype=np.int64)
+        for pos, key in enumerate(_task_keys(graph.orders, model_idx)):
+            joint = key_index.get(key)
+            if joint is None:
+                joint = key_index[key] = len(orders)
+                orders.append(graph.orders[pos])
+            row_map[pos] = joint
+        row_maps[name] = row_map
+
+    n = len(orders)
+    weighted = np.zeros(n)
+    timed = np.zeros(n, dtype=bool)
+    members = np.zeros(n, dtype=np.int64)
+    needs_crane = np.zeros(n, dtype=bool)
+    plain = np.zeros(n, dtype=bool)
+    skipped = np.zeros(n, dtype=bool)
+    src_parts, dst_parts = [], []
+
+    for name, graph in graphs.items():
+        row_map = row_maps[name]
+        times = graph.times
+        has_time = ~np.isnan(times)
+        # A model that skips the task does no work on it, whatever time its sheet lists
+        worked = has_time & (graph.crane != -1)
+        np.add.at(weighted, row_map[worked], times[worked] * quantities[name])
+        np.logical_or.at(timed, row_map, has_time)
+        np.add.at(members, row_map, 1)
+        np.logical_or.at(needs_crane, row_map, graph.crane == 1)
+        np.logical_or.at(plain, row_map, graph.crane == 0)
+        np.logical_or.at(skipped, row_map, graph.crane == -1)
+
+        src_parts.append(row_map[np.repeat(np.arange(len(graph)), np.diff(graph.pred_ptr))])
+        dst_parts.append(row_map[graph.pred_idx])
+
+    times = np.where(timed, weighted / total_quantity if total_quantity else np.nan, np.nan)
+    crane = np.select([needs_crane, plain, skipped], [1.0, 0.0, -1.0], default=np.nan)
+
+    # Union of edges, grouped by task; each task keeps its predecessors in first-seen order
+    edges = pd.DataFrame({
+        'task': np.concatenate(src_parts) if src_parts else np.empty(0, dtype=np.int64),
+        'pred': np.concatenate(dst_parts) if dst_parts else np.empty(0, dtype=np.int64),
+    }).drop_duplicates()
+    edges = edges.sort_values('task', kind='stable')
+    pred_ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges['task'].to_numpy(), minlength=n), out=pred_ptr[1:])
+
+    graph = TaskGraph(
+        labels=list(range(n)),
+        orders=orders,
+        times=times,
+        crane=crane,
+        pred_ptr=pred_ptr,
+        pred_idx=edges['pred'].to_numpy(dtype=np.int64),
+    )
+    return MixedGraph(compute_topology(graph), row_maps, members, quantities)
+
+
+def model_quantities(models):
+    """Requested quantity per (safe) model name."""
+    quantities = {}
+    for model in models:
+        name = safe_model_name(model['name'])
+        quantities[name] = quantities.get(name, 0) + model['quantity']
+    return quantities
+
+
+def split_mixed_solution(mixed, solution, graphs, cycle_time):
+    """
+    Project the shared layout back onto every model.
+
+    Each model gets the same stations, holding only its own tasks (as its own
+    DataFrame labels). ``time_rem`` is what a unit of that model leaves of the
+    cycle time at the station, so it is negative where that model alone
+    overloads a station the mix as a whole can carry. Tasks the model itself
+    skips (Crane Required == -1) stay off its stations even when another
+    model needs them on the line.
+    """
+    final_result = {}
+    summary = {}
+    for name, graph in graphs.items():
+        skipped = graph.skip_mask
+        joint_to_row = {
+            joint: pos for pos, joint in enumerate(mixed.row_maps[name].tolist()) if not skipped[pos]
+        }
+        times = np.nan_to_num(graph.times, nan=0.0).tolist()
+        labels = graph.labels
+        stations = []
+        for station in solution:
+            rows = [joint_to_row[joint] for joint in station['task_order'] if joint in joint_to_row]
+            load = sum(times[pos] for pos in rows)
+            stations.append({
+                'crane_aval': station['crane_aval'],
+                'task_order': [labels[pos] for pos in rows],
+                'time_rem': cycle_time - load,
+            })
+        loads = [cycle_time - station['time_rem'] for station in stations]
+        final_result[name] = stations
+        summary[name] = {
+            'quantity': mixed.quantities[name],
+            'tasks': len(graph),
+            'max_station_load': round(max(loads), 4) if loads else 0.0,
+            'overloaded_stations': sum(1 for load in loads if load > cycle_time),
+        }
+    return final_result, summary
+
+
+def balance_mixed(graphs, quantities, cycle_time, noOfStations, crane_pos, ordering=DEFAULT_ORDERING,
+                  warm_start=True, on_iteration=None, strategies=None, strategy_budget=None):
+    """
+    Balance all models together on one shared station layout.
+
+    Returns ``(final_result, info)``: ``final_result`` has the usual
+    ``{model: [station, ...]}`` shape (every model on the same stations), and
+    ``info`` describes the shared layout, the per-model loads, the
+    convergence run (with the ``strategy`` that produced the shared layout)
+    and any cycles the merged precedence graph picked up.
+    """
+    mixed = build_mixed_graph(graphs, quantities)
+    solution, _, report = run_strategies(mixed.graph, cycle_time, noOfStations, crane_pos, strategies,
+                                         ordering=ordering, budget=strategy_budget, warm_start=warm_start,
+                                         on_iteration=on_iteration)
+    final_result, per_model = split_mixed_solution(mixed, solution, graphs, cycle_time)
+
+    work = mixed.graph.total_time
+    capacity = len(solution) * cycle_time
+    info = {
+        'stations': len(solution),
+        'tasks': len(mixed.graph),
+        'shared_tasks': int((mixed.members > 1).sum()),
+        'weighted_work_content': round(work, 4),
+        'balance_efficiency': round(work / capacity, 4) if capacity > 0 else None,
+        'station_time_rem': [station['time_rem'] for station in solution],
+        'models': per_model,
+        'iterations': dict(report.pop('run'), strategy=report),
+        # Orders that precede each other in different sheets form cycles once merged
+        'cycles': [[mixed.graph.orders[pos] for pos in component] for component in find_cycles(mixed.graph)],
+    }
+    return final_result, info
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .lb_graph import DEFAULT_ORDERING
+
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    # Results are plain Python already; numpy scalars can still slip through metadata
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def canonical_params(parsed_data):
+    """
+    The request parameters that decide a result, in a stable form.
+
+    Parameters that only change how the work is done (parallel, workers,
+    warm start) or that are not part of the result (date, line, file name)
+    are left out, so those requests share an entry. Crane positions and
+    models are order-independent.
+    """
+    models = sorted((str(model['name']), model['quantity']) for model in parsed_data.get('models', []))
+    strategies = parsed_data.get('strategies') or 'first_fit'
+    if isinstance(strategies, str):
+        strategies = strategies.split(',')
+    return {
+        'shift': parsed_data.get('shift'),
+        'noOfStations': int(parsed_data.get('noOfStations') or 0),
+        'crane_pos': sorted(set(int(pos) for pos in parsed_data.get('crane_pos', []))),
+        'models': models,
+        'ordering': parsed_data.get('ordering') or DEFAULT_ORDERING,
+        'response_format': parsed_data.get('response_format') or 'verbose',
+        'validation': parsed_data.get('validation') or 'warn',
+        'mode': parsed_data.get('mode') or 'per_model',
+        'strategies': sorted(set(str(name).strip().lower() for name in strategies)),
+        'strategy_budget': parsed_data.get('strategy_budget'),
+    }
+
+
+def result_key(content_hash, parsed_data):
+    """``<workbook hash>-<parameter digest>``; the prefix lets a workbook be invalidated as a whole."""
+    params = json.dumps(canonical_params(parsed_data), sort_keys=True, default=str)
+    return f"{content_hash}-{hashlib.sha256(params.encode('utf-8')).hexdigest()[:24]}"
+
+
+class ResultCache:
+    """
+    Finished ``process_lb_file`` responses keyed by ``result_key``.
+
+    Entries are stored as JSON text, so a hit is one ``json.loads`` and
+    callers always get their own copy. Entries expire ``ttl`` seconds after
+    they were stored (0 keeps them until evicted) and the in-memory LRU holds
+    at most ``max_entries``. With ``disk_dir`` set every entry is also
+    written to ``<disk_dir>/<key>.json`` and read back after a restart.
+    """
+
+    def __init__(self, max_entries=128, ttl=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _expired(self, stored_at, now):
+        return bool(self.ttl) and now - stored_at > self.ttl
+
+    def get(self, key):
+        """``(result, stored_at)`` for a live entry, else ``None``."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0], now):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[1]), entry[0]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return json.loads(entry[1]), entry[0]
+
+    def put(self, key, result):
+        try:
+            text = json.dumps(result, default=_json_default)
+        except (TypeError, ValueError) as e:
+            logger.warning("⚠️ Result %s not cached: %s", key, e)
+            return
+        entry = (time.time(), text)
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def invalidate(self, content_hash=None):
+        """Drop every entry, or only those of one workbook. Returns the number of entries removed."""
+        prefix = f'{content_hash}-' if content_hash else ''
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+        removed = set(keys)
+
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for filename in os.listdir(self.disk_dir):
+                if filename.startswith(prefix) and filename.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, filename))
+                        removed.add(filename[:-len('.json')])
+                    except OSError as e:
+                        logger.warning("⚠️ Could not remove cached result %s: %s", filename, e)
+        return len(removed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'disk_dir': self.disk_dir,
+            }
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ----------------------------
+    # On-disk copy
+    # ----------------------------
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = os.path.join(self.disk_dir, f'{key}.json')
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as fh:
+                stored = json.load(fh)
+        except Exception as e:
+            logger.warning("⚠️ Could not read cached result %s: %s", key, e)
+            return None
+        if self._expired(stored['stored_at'], now):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return stored['stored_at'], stored['result']
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            # Write then rename, so a reader never sees half a file
+            tmp_path = os.path.join(self.disk_dir, f'{key}.json.tmp')
+            with open(tmp_path, 'w') as fh:
+                json.dump({'stored_at': entry[0], 'result': entry[1]}, fh)
+            os.replace(tmp_path, os.path.join(self.disk_dir, f'{key}.json'))
+        except Exception as e:
+            logger.warning("⚠️ Could not write cached result %s: %s", key, e)
+
+
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('LB_RESULT_CACHE_SIZE', 128)),
+    ttl=float(os.environ.get('LB_RESULT_CACHE_TTL', 3600)),
+    disk_dir=os.environ.get('LB_RESULT_CACHE_DIR') or None,
+)
@@ -0,0 +1,147 @@
+import numpy as np
+
+
+NEG_INF = float('-inf')
+
+# Stations checked directly before falling back to the segment trees
+PROBE_WINDOW = 32
+
+
+class StationIndex:
+    """
+    Station state plus a first-fit index over the remaining time per station.
+
+    Two max segment trees are kept over ``time_rem``: one over every station
+    and one where stations without a crane count as full. ``first_fit``
+    answers "first station at or after ``start`` whose remaining time is at
+    least ``task_time``", giving exactly the station the old linear scan
+    would have picked.
+
+    The balancer's insertion pointer only moves forward, so most lookups are
+    answered within a few stations. Those are served by a short direct probe;
+    the trees are built on the first long lookup and then kept in sync with
+    the stations touched since (O(log n) per lookup after that).
+    """
+
+    def __init__(self, time_rem, crane_aval):
+        self.time_rem = list(time_rem)
+        self.crane_aval = list(crane_aval)
+        self._size = 0
+        self._all = None
+        self._crane = None
+        self._dirty = set()
+        # Placement counters: lookups, stations probed directly, lookups that fell back to a tree
+        self.lookups = 0
+        self.scanned = 0
+        self.tree_lookups = 0
+
+    def __len__(self):
+        return len(self.time_rem)
+
+    def _rebuild(self):
+        n = len(self.time_rem)
+        size = 1
+        while size < n:
+            size <<= 1
+        self._size = size
+
+        leaves = np.full(size, NEG_INF)
+        rem = np.asarray(self.time_rem, dtype=np.float64)
+        leaves[:n] = np.where(np.isnan(rem), NEG_INF, rem)
+        crane_leaves = np.where(np.asarray(self.crane_aval + [0] * (size - n)) == 1, leaves, NEG_INF)
+        self._all = self._build(leaves)
+        self._crane = self._build(crane_leaves)
+        self._dirty.clear()
+
+    @staticmethod
+    def _build(leaves):
+        # Fill the implicit heap layout level by level, vectorised
+        size = len(leaves)
+        tree = np.full(2 * size, NEG_INF)
+        tree[size:] = leaves
+        lo = size
+        while lo > 1:
+            hi, lo = lo, lo // 2
+            tree[lo:hi] = np.maximum(tree[2 * lo:2 * hi:2], tree[2 * lo + 1:2 * hi:2])
+        return tree.tolist()
+
+    @staticmethod
+    def _set(tree, i, value):
+        tree[i] = value
+        i >>= 1
+        while i:
+            best = max(tree[2 * i], tree[2 * i + 1])
+            if tree[i] == best:
+                break
+            tree[i] = best
+            i >>= 1
+
+    def _sync(self):
+        # Build on first use, or bring the trees up to date with touched stations
+        if self._all is None or len(self.time_rem) > self._size:
+            self._rebuild()
+            return
+        size = self._size
+        for w in self._dirty:
+            rem = self.time_rem[w]
+            # A NaN remaining time never satisfies `task_time <= time_rem`
+            leaf = NEG_INF if rem != rem else rem
+            self._set(self._all, size + w, leaf)
+            # Stations without a crane stay at -inf in the crane tree
+            if self.crane_aval[w] == 1:
+                self._set(self._crane, size + w, leaf)
+        self._dirty.clear()
+
+    def first_fit(self, start, task_time, needs_crane=False):
+        """Return the first station >= start that can take task_time, or -1."""
+        n = len(self.time_rem)
+        self.lookups += 1
+        if task_time != task_time or start >= n:
+            return -1
+
+        time_rem = self.time_rem
+        crane_aval = self.crane_aval
+        stop = min(start + PROBE_WINDOW, n)
+        for w in range(start, stop):
+            if needs_crane and crane_aval[w] != 1:
+                continue
+            if task_time <= time_rem[w]:
+                self.scanned += w - start + 1
+                return w
+        self.scanned += stop - start
+        if stop == n:
+            return -1
+
+        self.tree_lookups += 1
+        self._sync()
+        tree = self._crane if needs_crane else self._all
+        size = self._size
+        i = stop + size
+        while True:
+            if tree[i] >= task_time:
+                # Descend to the left-most leaf that fits
+                while i < size:
+                    i <<= 1
+                    if tree[i] < task_time:
+                        i += 1
+                return i - size
+            # Climb while we are a right child, then step to the right sibling
+            while i & 1:
+                i >>= 1
+            if i == 0:
+                return -1
+            i += 1
+
+    def place(self, w, task_time):
+        self.time_rem[w] -= task_time
+        if self._all is not None:
+            self._dirty.add(w)
+
+    def add_station(self, crane_aval, time_rem):
+        """Append a new station and return its position."""
+        self.time_rem.append(time_rem)
+        self.crane_aval.append(crane_aval)
+        w = len(self.time_rem) - 1
+        if self._all is not None and w < self._size:
+            self._dirty.add(w)
+        return w
@@ -0,0 +1,416 @@
+import bisect
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from .lb_graph import DEFAULT_ORDERING, BalanceContext, balance_task_graph
+
+
+# Built-in balancing strategies, in the order they are tried
+STRATEGIES = ('first_fit', 'rpw', 'largest_candidate', 'local_search')
+
+# Wall-clock budget per strategy and model, in seconds
+DEFAULT_BUDGET = float(os.environ.get('LB_STRATEGY_BUDGET', 2.0))
+
+
+def parse_strategies(value):
+    """Strategy names from a form/JSON value: a list, a comma separated string or 'all'."""
+    if not value:
+        return ('first_fit',)
+    if isinstance(value, str):
+        if value.strip().lower() == 'all':
+            return STRATEGIES
+        value = value.split(',')
+    names = tuple(dict.fromkeys(str(name).strip().lower() for name in value if str(name).strip()))
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown strategy '{unknown[0]}'. Expected one of: {', '.join(STRATEGIES)}")
+    return names or ('first_fit',)
+
+
+class StrategyTimeout(Exception):
+    """Raised inside a pass when its strategy ran out of time budget."""
+
+
+# Deadline of the strategy running on this thread (contexts are shared between threads)
+_deadline = threading.local()
+
+
+def _out_of_time(ctx):
+    deadline = getattr(_deadline, 'value', None)
+    return deadline is not None and time.perf_counter() > deadline
+
+
+def _check_deadline(ctx):
+    if _out_of_time(ctx):
+        raise StrategyTimeout()
+
+
+def _task_times(ctx):
+    # NaN times count as zero work in the heuristics
+    times = ctx.extras.get('times')
+    if times is None:
+        times = ctx.extras['times'] = [0.0 if t != t else t for t in ctx.times]
+    return times
+
+
+def _forward_preds(ctx):
+    """Predecessors that come earlier in topological rank (edges closing a cycle are ignored)."""
+    preds = ctx.extras.get('forward_preds')
+    if preds is None:
+        rank = ctx.rank
+        preds = ctx.extras['forward_preds'] = [
+            [p for p in ctx.preds[ctx.ptr[j]:ctx.ptr[j + 1]] if rank[p] < rank[j]]
+            for j in range(len(ctx.times))
+        ]
+    return preds
+
+
+def _forward_succs(ctx):
+    succs = ctx.extras.get('forward_succs')
+    if succs is None:
+        rank = ctx.rank
+        succs = ctx.extras['forward_succs'] = [
+            [s for s in ctx.succs[ctx.s_ptr[j]:ctx.s_ptr[j + 1]] if rank[s] > rank[j]]
+            for j in range(len(ctx.times))
+        ]
+    return succs
+
+
+def positional_weights(ctx):
+    """
+    Ranked positional weight of every task: its own time plus the time of
+    every task that transitively follows it.
+
+    Follower sets are Python int bitsets built in reverse topological order;
+    the weights are then one packed-bit dot product per task.
+    """
+    weights = ctx.extras.get('rpw')
+    if weights is not None:
+        return weights
+
+    n = len(ctx.times)
+    times = np.asarray(_task_times(ctx))
+    succs = _forward_succs(ctx)
+    order = sorted(range(n), key=ctx.rank.__getitem__, reverse=True)
+    reach = [0] * n
+    nbytes = (n + 7) // 8
+    weights = [0.0] * n
+    for count, j in enumerate(order):
+        bits = 0
+        for s in succs[j]:
+            bits |= reach[s] | (1 << s)
+        reach[j] = bits
+        if bits:
+            mask = np.unpackbits(np.frombuffer(bits.to_bytes(nbytes, 'little'), dtype=np.uint8),
+                                 bitorder='little')[:n]
+            weights[j] = float(times[j] + times[mask.astype(bool)].sum())
+        else:
+            weights[j] = float(times[j])
+        if count % 256 == 0:
+            _check_deadline(ctx)
+
+    ctx.extras['rpw'] = weights
+    return weights
+
+
+def _station_oriented_pass(ctx, cycle_time, crane_aval, priority):
+    """
+    Fill stations one at a time with the highest-priority available task that fits.
+
+    A task is available once all its predecessors are on the current or an
+    earlier station. Crane tasks only go to stations with a crane. When the
+    layout runs out, stations are appended (with a crane if the best
+    available task needs one); a task longer than the cycle time gets a
+    station of its own, as in the first-fit pass.
+    """
+    n = len(ctx.times)
+    times = _task_times(ctx)
+    crane = ctx.crane
+    preds = _forward_preds(ctx)
+    succs = _forward_succs(ctx)
+    skip = ctx.skip_done
+
+    done = list(skip)
+    waiting = [sum(1 for p in preds[j] if not skip[p]) for j in range(n)]
+    # Sorted by descending priority, then topological rank for a stable tie order
+    available = sorted((-priority[j], ctx.rank[j], j) for j in range(n) if not skip[j] and waiting[j] == 0)
+    # Sorted times of the available tasks (all, and those needing no crane): a station
+    # with less room than the shortest one is closed without scanning the candidates
+    fit_any = sorted(times[j] for _, _, j in available)
+    fit_plain = sorted(times[j] for _, _, j in available if crane[j] != 1)
+
+    layout_size = len(crane_aval)
+    time_rem = [cycle_time] * layout_size
+    crane_aval = list(crane_aval)
+    task_order = [[] for _ in crane_aval]
+    lookups = scanned = 0
+    remaining = n - sum(skip)
+
+    w = 0
+    while remaining:
+        if w == len(time_rem):
+            needs = crane[available[0][2]] == 1
+            time_rem.append(cycle_time)
+            crane_aval.append(1 if needs else 0)
+            task_order.append([])
+
+        pick = -1
+        lookups += 1
+        shortest = fit_any if crane_aval[w] == 1 else fit_plain
+        if shortest and shortest[0] <= time_rem[w]:
+            for i, (_, _, j) in enumerate(available):
+                scanned += 1
+                if crane[j] == 1 and crane_aval[w] != 1:
+                    continue
+                if times[j] <= time_rem[w]:
+                    pick = i
+                    break
+
+        if pick < 0:
+            if not task_order[w] and w >= layout_size:
+                # Nothing fits an empty appended station: the task is longer than the cycle
+                pick = 0
+            else:
+                w += 1
+                _check_deadline(ctx)
+                continue
+
+        _, _, j = available.pop(pick)
+        fit_any.pop(bisect.bisect_left(fit_any, times[j]))
+        if crane[j] != 1:
+            fit_plain.pop(bisect.bisect_left(fit_plain, times[j]))
+        task_order[w].append(j)
+        time_rem[w] -= times[j]
+        done[j] = True
+        remaining -= 1
+        for s in succs[j]:
+            waiting[s] -= 1
+            if waiting[s] == 0 and not skip[s]:
+                bisect.insort(available, (-priority[s], ctx.rank[s], s))
+                bisect.insort(fit_any, times[s])
+                if crane[s] != 1:
+                    bisect.insort(fit_plain, times[s])
+
+    counters = {
+        'tasks_placed': n - sum(skip),
+        'stations_added': len(time_rem) - layout_size,
+        'placement_lookups': lookups,
+        'stations_scanned': scanned,
+        'tree_lookups': 0,
+    }
+    return time_rem, crane_aval, task_order, done, counters
+
+
+def rpw_pass(ctx, cycle_time, crane_aval):
+    return _station_oriented_pass(ctx, cycle_time, crane_aval, positional_weights(ctx))
+
+
+def largest_candidate_pass(ctx, cycle_time, crane_aval):
+    return _station_oriented_pass(ctx, cycle_time, crane_aval, _task_times(ctx))
+
+
+STATION_PASSES = {
+    'first_fit': None,                 # the original greedy pass
+    'rpw': rpw_pass,
+    'largest_candidate': largest_candidate_pass,
+}
+
+
+def improve_solution(ctx, solution, cycle_time, noOfStations, max_sweeps=50):
+    """
+    Bounded local search between adjacent stations.
+
+    Moves a task to the neighbouring station, or swaps two tasks across it,
+    whenever that keeps precedence, capacity and crane rules and makes the
+    loads more uneven (sum of squared loads goes up). That concentrates work
+    and empties stations; emptied stations in front of the requested layout
+    (the ones the convergence loop added beyond ``noOfStations``) are then
+    dropped, so the requested stations keep their numbers and cranes. Stops after ``max_sweeps`` sweeps
+    without change or when the strategy's deadline passes, keeping the best
+    layout found so far. ``solution`` holds task positions, not labels.
+    """
+    times = _task_times(ctx)
+    crane = ctx.crane
+    preds = _forward_preds(ctx)
+    succs = _forward_succs(ctx)
+
+    stations = [list(st['task_order']) for st in solution]
+    crane_aval = [st['crane_aval'] for st in solution]
+    load = [sum(times[j] for j in st) for st in stations]
+    station_of = {}
+    for w, st in enumerate(stations):
+        for j in st:
+            station_of[j] = w
+
+    def can_sit(j, w):
+        if crane[j] == 1 and crane_aval[w] != 1:
+            return False
+        return (all(station_of.get(p, -1) <= w for p in preds[j])
+                and all(station_of.get(s, w) >= w for s in succs[j]))
+
+    moves = 0
+    for _ in range(max_sweeps):
+        changed = False
+        for w in range(len(stations) - 1):
+            if _out_of_time(ctx):
+                changed = False
+                break
+            a_side, b_side = w, w + 1
+            for src, dst in ((b_side, a_side), (a_side, b_side)):
+                for j in list(stations[src]):
+                    t = times[j]
+                    # Gain in sum of squared loads: 2t(dst - src + t)
+                    if load[dst] + t > cycle_time or load[dst] - load[src] + t <= 0:
+                        continue
+                    station_of[j] = dst
+                    if not can_sit(j, dst):
+                        station_of[j] = src
+                        continue
+                    stations[src].remove(j)
+                    # Earlier station: after its predecessors; later station: before its successors
+                    if dst < src:
+                        stations[dst].append(j)
+                    else:
+                        stations[dst].insert(0, j)
+                    load[src] -= t
+                    load[dst] += t
+                    moves += 1
+                    changed = True
+
+            # Swaps: the heavier station takes the larger task
+            heavy, light = (a_side, b_side) if load[a_side] >= load[b_side] else (b_side, a_side)
+            for j in list(stations[light]):
+                for k in list(stations[heavy]):
+                    delta = times[j] - times[k]
+                    if delta <= 0 or load[heavy] + delta > cycle_time:
+                        continue
+                    station_of[j], station_of[k] = heavy, light
+                    if not (can_sit(j, heavy) and can_sit(k, light)):
+                        station_of[j], station_of[k] = light, heavy
+                        continue
+                    stations[light].remove(j)
+                    stations[heavy].remove(k)
+                    if heavy > light:
+                        stations[heavy].insert(0, j)
+                        stations[light].append(k)
+                    else:
+                        stations[heavy].append(j)
+                        stations[light].insert(0, k)
+                    load[heavy] += delta
+                    load[light] -= delta
+                    moves += 1
+                    changed = True
+                    break
+        if not changed:
+            break
+
+    # Stations are numbered from the end of the line (the requested layout is the last
+    # ``noOfStations``), so only emptied stations added in front of it can be dropped
+    extra = len(stations) - noOfStations
+    keep = [w for w in range(len(stations)) if w >= extra or stations[w]]
+
+    improved = [
+        {'crane_aval': crane_aval[w], 'task_order': stations[w], 'time_rem': cycle_time - load[w]}
+        for w in keep
+    ]
+    return improved, moves
+
+
+def _score(solution, work, cycle_time):
+    stations = len(solution)
+    capacity = stations * cycle_time
+    loads = [cycle_time - st['time_rem'] for st in solution if st['time_rem'] == st['time_rem']]
+    peak = max(loads) if loads else 0.0
+    return {
+        'stations': stations,
+        'efficiency': round(work / capacity, 4) if capacity > 0 else None,
+        'idle_time': round(capacity - work, 4),
+        # Smoothness index: how far station loads sit below the busiest station
+        'smoothness': round(math.sqrt(sum((peak - load) ** 2 for load in loads)), 4),
+    }
+
+
+def _to_positions(solution, graph):
+    position = {label: pos for pos, label in enumerate(graph.labels)}
+    return [dict(st, task_order=[position[label] for label in st['task_order']]) for st in solution]
+
+
+def _to_labels(solution, graph):
+    labels = graph.labels
+    return [dict(st, task_order=[labels[pos] for pos in st['task_order']]) for st in solution]
+
+
+def run_strategies(graph, cycle_time, noOfStations, crane_pos, strategies=('first_fit',), ordering=DEFAULT_ORDERING,
+                   budget=None, warm_start=True, on_iteration=None, context=None):
+    """
+    Balance one graph with every requested strategy and keep the best layout.
+
+    Best means fewest stations, then highest efficiency, then the smoothest
+    loads. Each strategy gets ``budget`` seconds; one that runs out is
+    reported as ``timed_out`` (``local_search`` instead stops early and keeps
+    what it has). ``first_fit`` always runs, untimed, as the baseline.
+
+    ``context`` is a BalanceContext of ``graph`` to reuse (and warm) across
+    calls; a fresh one is used otherwise.
+
+    Returns ``(solution, done, report)`` where ``report`` has the selected
+    strategy, per-strategy scores and the selected run's convergence stats.
+    """
+    strategies = parse_strategies(strategies)
+    budget = DEFAULT_BUDGET if budget is None else float(budget)
+
+    if context is None:
+        context = BalanceContext(graph, ordering)
+    work = graph.total_time
+    results = {}
+    scores = {}
+
+    start = time.perf_counter()
+    baseline = balance_task_graph(graph, cycle_time, noOfStations, crane_pos, ordering=ordering,
+                                  on_iteration=on_iteration, context=context, warm_start=warm_start)
+    results['first_fit'] = (baseline, context.last_run)
+    scores['first_fit'] = dict(_score(baseline[0], work, cycle_time), seconds=round(time.perf_counter() - start, 4))
+
+    for name in strategies:
+        if name in results:
+            continue
+        start = time.perf_counter()
+        _deadline.value = start + budget
+        try:
+            if name == 'local_search':
+                base_solution, base_done = results['first_fit'][0]
+                improved, moves = improve_solution(context, _to_positions(base_solution, graph), cycle_time,
+                                                   noOfStations)
+                solution = _to_labels(improved, graph)
+                results[name] = ((solution, base_done), dict(results['first_fit'][1], moves=moves))
+            else:
+                outcome = balance_task_graph(graph, cycle_time, noOfStations, crane_pos, ordering=ordering,
+                                             context=context, warm_start=warm_start,
+                                             station_pass=STATION_PASSES[name])
+                results[name] = (outcome, context.last_run)
+            scores[name] = dict(_score(results[name][0][0], work, cycle_time),
+                                seconds=round(time.perf_counter() - start, 4))
+        except StrategyTimeout:
+            scores[name] = {'timed_out': True, 'seconds': round(time.perf_counter() - start, 4)}
+        finally:
+            _deadline.value = None
+
+    ranked = sorted(
+        results,
+        key=lambda name: (scores[name]['stations'], -(scores[name]['efficiency'] or 0),
+                          scores[name]['smoothness'], STRATEGIES.index(name)),
+    )
+    selected = ranked[0]
+    (solution, done), run_stats = results[selected]
+    report = {
+        'strategy': selected,
+        'stations': scores[selected]['stations'],
+        'efficiency': scores[selected]['efficiency'],
+        'strategies': scores,
+        'run': run_stats,
+    }
+    return solution, done, report
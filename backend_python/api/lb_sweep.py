@@ -0,0 +1,253 @@
+import itertools
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .lb import format_result, line_timing, load_model_tables, workbook_hash
+from .lb_graph import DEFAULT_ORDERING, BalanceContext, balance_task_graph
+from .lb_ingest import ingest_models
+from .lb_loaders import safe_model_name
+from .lb_uploads import workbook_source
+
+
+logger = logging.getLogger(__name__)
+
+
+# Parameters a scenario may override, in the order grids are expanded
+SWEEP_AXES = ('noOfStations', 'shift', 'crane_pos', 'models')
+
+MAX_SCENARIOS = int(os.environ.get('LB_SWEEP_MAX_SCENARIOS', 200))
+
+
+def _validate_scenario(scenario):
+    scenario['noOfStations'] = int(scenario['noOfStations'])
+    scenario['crane_pos'] = [int(pos) for pos in scenario['crane_pos']]
+    if not scenario['models'] or any('name' not in m or 'quantity' not in m for m in scenario['models']):
+        raise ValueError('Every scenario needs a non-empty models list of {name, quantity}')
+    return scenario
+
+
+def expand_scenarios(base, spec):
+    """
+    Turn a sweep spec into a flat list of scenarios.
+
+    ``spec`` is either a list of override dicts, or a dict with a ``grid`` of
+    ``{axis: [values]}`` (expanded as a cartesian product) and/or an explicit
+    ``scenarios`` list. Axes not mentioned keep the value from ``base``.
+    """
+    if isinstance(spec, list):
+        spec = {'scenarios': spec}
+    if not isinstance(spec, dict):
+        raise ValueError('scenarios must be a list or an object with "grid" / "scenarios"')
+
+    defaults = {axis: base.get(axis) for axis in SWEEP_AXES}
+    overrides = []
+
+    grid = spec.get('grid') or {}
+    unknown = set(grid) - set(SWEEP_AXES)
+    if unknown:
+        raise ValueError(f"Unknown sweep axes: {', '.join(sorted(unknown))}")
+    if grid:
+        axes = [axis for axis in SWEEP_AXES if axis in grid]
+        for values in itertools.product(*(grid[axis] for axis in axes)):
+            overrides.append(dict(zip(axes, values)))
+
+    overrides.extend(spec.get('scenarios') or [])
+    if not overrides:
+        overrides = [{}]
+    if len(overrides) > MAX_SCENARIOS:
+        raise ValueError(f'Sweep has {len(overrides)} scenarios; the limit is {MAX_SCENARIOS}')
+
+    scenarios = []
+    for scenario_id, override in enumerate(overrides):
+        scenario = dict(defaults, **{k: v for k, v in override.items() if k in SWEEP_AXES})
+        scenario['id'] = scenario_id
+        scenarios.append(_validate_scenario(scenario))
+    return scenarios
+
+
+def summarize_solution(graph, solution, cycle_time, manpower):
+    """Stations used, idle time, balance efficiency and manpower for one model's layout."""
+    position = {label: pos for pos, label in enumerate(graph.labels)}
+    stations = len(solution)
+    idle_time = sum(st['time_rem'] for st in solution if not math.isnan(st['time_rem']))
+    capacity = stations * cycle_time
+    total_manpower = 0
+    for st in solution:
+        crew = np.nansum(manpower[[position[label] for label in st['task_order']]]) if st['task_order'] else 0.0
+        total_manpower += math.ceil(crew)
+    return {
+        'stations': stations,
+        'work_content': round(graph.total_time, 4),
+        'idle_time': round(idle_time, 4),
+        'balance_efficiency': round(graph.total_time / capacity, 4) if capacity > 0 else None,
+        'manpower': total_manpower,
+    }
+
+
+def _evaluate_scenario(scenario, contexts, manpower, keep_layout):
+    start = time.perf_counter()
+    total_time, takt_time, cycle_time, total_model = line_timing(scenario['shift'], scenario['models'])
+
+    per_model = {}
+    layouts = {}
+    for model in scenario['models']:
+        name = safe_model_name(model['name'])
+        context = contexts[name]
+        solution, _ = balance_task_graph(
+            context.graph, cycle_time, scenario['noOfStations'], scenario['crane_pos'],
+            ordering=context.ordering, context=context
+        )
+        per_model[name] = summarize_solution(context.graph, solution, cycle_time, manpower[name])
+        per_model[name]['iterations'] = context.last_run['iterations']
+        per_model[name]['memo_hits'] = context.last_run['memo_hits']
+        if keep_layout:
+            layouts[name] = solution
+
+    work = sum(m['work_content'] for m in per_model.values())
+    capacity = sum(m['stations'] for m in per_model.values()) * cycle_time
+    row = {
+        'id': scenario['id'],
+        'shift': scenario['shift'],
+        'noOfStations': scenario['noOfStations'],
+        'crane_pos': scenario['crane_pos'],
+        'models': scenario['models'],
+        'cycle_time': round(cycle_time, 4),
+        'takt_time': round(takt_time, 4),
+        # A shared line needs as many stations as its longest model layout
+        'stations_used': max(m['stations'] for m in per_model.values()),
+        'idle_time': round(sum(m['idle_time'] for m in per_model.values()), 4),
+        'balance_efficiency': round(work / capacity, 4) if capacity > 0 else None,
+        'manpower': max(m['manpower'] for m in per_model.values()),
+        'per_model': per_model,
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+    return row, layouts
+
+
+# Worker-process state, shipped once per worker through the pool initializer
+_worker_state = {}
+
+
+def _init_sweep_worker(graphs, manpower, ordering):
+    # Each worker keeps its own contexts, so its pass memo carries across scenarios
+    contexts = {name: BalanceContext(graph, ordering) for name, graph in graphs.items()}
+    _worker_state.update(contexts=contexts, manpower=manpower)
+
+
+def _evaluate_in_worker(args):
+    scenario, keep_layout = args
+    return _evaluate_scenario(scenario, _worker_state['contexts'], _worker_state['manpower'], keep_layout)
+
+
+def _pick_layouts(requested, scenarios):
+    if requested in (None, 'best', [], ''):
+        return set()
+    if requested == 'all':
+        return {scenario['id'] for scenario in scenarios}
+    return {int(scenario_id) for scenario_id in requested}
+
+
+def best_scenario(rows):
+    # Fewest stations, then highest efficiency, then lowest manpower
+    return min(rows, key=lambda r: (r['stations_used'], -(r['balance_efficiency'] or 0), r['manpower'], r['id']))['id']
+
+
+def run_lb_sweep(parsed_data, spec, layouts=None):
+    """
+    Balance one workbook for a grid of scenarios.
+
+    The workbook is parsed and every model compiled into a TaskGraph once;
+    scenarios then only re-run the balancer, in a process pool when
+    ``parsed_data['parallel']`` is set. Returns a compact comparison table and
+    full post-processed layouts for the scenario ids in ``layouts`` (a list,
+    ``'best'`` or ``'all'``).
+    """
+    try:
+        data = parsed_data
+        started = time.perf_counter()
+        scenarios = expand_scenarios(data, spec)
+
+        # ✅ Parse and preprocess once for every scenario
+        source, filename = workbook_source(data)
+        content_hash = data.get('content_hash') or workbook_hash(data)
+        model_set = {m['name'] for scenario in scenarios for m in scenario['models']}
+        model_dfs, sheets, cache_hit = load_model_tables(source, content_hash, model_set, filename)
+
+        needed = {safe_model_name(m['name']) for scenario in scenarios for m in scenario['models']}
+        missing = needed - set(model_dfs)
+        if missing:
+            raise ValueError(f"No ModelData sheet for: {', '.join(sorted(missing))}")
+
+        ingested = ingest_models(content_hash, model_dfs)
+        graphs = {name: model.graph for name, model in ingested.items()}
+        manpower = {
+            name: pd.to_numeric(df['Manpower (19)'], errors='coerce').to_numpy(dtype=np.float64)
+            for name, df in model_dfs.items()
+        }
+        ordering = data.get('ordering') or DEFAULT_ORDERING
+        response_format = data.get('response_format') or 'verbose'
+        # The ingest cache keeps each model's preprocessed context, so later sweeps of this workbook reuse it
+        contexts = {name: model.context(ordering) for name, model in ingested.items()}
+        preprocess_seconds = time.perf_counter() - started
+
+        # Layouts are only kept for explicitly requested ids; 'best' needs the table first
+        wanted = _pick_layouts(layouts, scenarios)
+        jobs = [(scenario, scenario['id'] in wanted) for scenario in scenarios]
+
+        parallel = bool(data.get('parallel', True)) and len(jobs) > 1
+        workers = (data.get('workers') or min(len(jobs), os.cpu_count() or 1)) if parallel else 1
+        if parallel:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker,
+                                     initargs=(graphs, manpower, ordering)) as executor:
+                outcomes = list(executor.map(_evaluate_in_worker, jobs))
+        else:
+            outcomes = [_evaluate_scenario(s, contexts, manpower, keep) for s, keep in jobs]
+
+        rows = [row for row, _ in outcomes]
+        best_id = best_scenario(rows)
+
+        full_layouts = {}
+        for (row, solutions), (scenario, _) in zip(outcomes, jobs):
+            if solutions:
+                full_layouts[row['id']] = format_result(
+                    solutions, model_dfs, scenario['noOfStations'], response_format
+                )
+        if layouts == 'best' and best_id not in full_layouts:
+            scenario = scenarios[best_id]
+            _, solutions = _evaluate_scenario(scenario, contexts, manpower, True)
+            full_layouts[best_id] = format_result(solutions, model_dfs, scenario['noOfStations'], response_format)
+
+        return {
+            'success': True,
+            'scenarios': rows,
+            'best_scenario': best_id,
+            'layouts': full_layouts,
+            'metadata': {
+                'total_scenarios': len(rows),
+                'parallel': parallel,
+                'workers': workers,
+                'ordering': ordering,
+                'preprocess_seconds': round(preprocess_seconds, 4),
+                'total_seconds': round(time.perf_counter() - started, 4),
+                'workbook_hash': content_hash,
+                'workbook_cache_hit': cache_hit,
+                'precedence_errors': {name: model.errors for name, model in ingested.items() if model.errors},
+                'sheets': sheets
+            }
+        }
+
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        logger.error("❌ Error occurred: %s\nFull traceback:\n%s", e, error_details)
+        return {
+            'success': False,
+            'message': str(e),
+            'traceback': error_details
+        }
@@ -0,0 +1,43 @@
+from flask import Blueprint, request, jsonify
+from .lb_sweep import run_lb_sweep
+from .lb_uploadController import parse_lb_upload_form
+import json
+import logging
+import traceback
+
+lb_sweepController_bp = Blueprint('lb_sweepController_bp', __name__)
+logger = logging.getLogger(__name__)
+
+
+@lb_sweepController_bp.route('/lb-sweep', methods=['POST'])
+def lb_sweepController():
+    try:
+        parsed_data, error = parse_lb_upload_form()
+        if error:
+            return error
+
+        # Scenario grid and which full layouts to return
+        try:
+            spec = json.loads(request.form.get('scenarios', '{}') or '{}')
+            layouts_raw = request.form.get('layouts', '')
+            layouts = layouts_raw if layouts_raw in ('', 'best', 'all') else json.loads(layouts_raw)
+        except json.JSONDecodeError as e:
+            return jsonify({
+                'success': False,
+                'message': f'Invalid scenarios/layouts JSON format: {str(e)}'
+            }), 400
+
+        # Sweeps evaluate scenarios in parallel unless explicitly disabled
+        parsed_data['parallel'] = request.form.get('parallel', 'true').strip().lower() in ('1', 'true', 'yes')
+
+        result = run_lb_sweep(parsed_data, spec, layouts or None)
+        return jsonify(result)
+
+    except Exception as e:
+        error_details = traceback.format_exc()
+        logger.error("ERROR in lb_sweepController: %s\n%s", e, error_details)
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'traceback': error_details
+        }), 500
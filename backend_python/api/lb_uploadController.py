@@ -1,118 +1,241 @@
 from flask import Blueprint, request, jsonify
 from .lb import process_lb_file  # This will now receive parsed data + file
+from .lb_cache import workbook_cache
+from .lb_graph import DEFAULT_ORDERING
+from .lb_loaders import SUPPORTED_EXTENSIONS
+from .lb_results import result_cache
+from .lb_uploads import bytes_content_hash, persist_uploads, upload_store
 import json
+import math
 import os
+import logging
+import time
 import traceback
 
 lb_uploadController_bp = Blueprint('lb_uploadController_bp', __name__)
+logger = logging.getLogger(__name__)
+
+
+def _flag(value):
+    return value.strip().lower() in ('1', 'true', 'yes')
+
+
+def parse_workers(value, field='workers'):
+    """A positive worker count; ``None`` when not given."""
+    if not value:
+        return None
+    try:
+        workers = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid {field} '{value}': expected a positive whole number") from None
+    if workers < 1:
+        raise ValueError(f"Invalid {field} '{value}': expected a positive whole number")
+    return workers
+
+
+def parse_strategy_budget(value):
+    """Seconds per strategy as a non-negative number; ``None`` when not given."""
+    if not value:
+        return None
+    try:
+        budget = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid strategy_budget '{value}': expected a number of seconds") from None
+    if not math.isfinite(budget) or budget < 0:
+        raise ValueError(f"Invalid strategy_budget '{value}': expected a number of seconds")
+    return budget
+
+
+def parse_lb_options(form):
+    """
+    Run options shared by every line-balancing endpoint, with their defaults.
+
+    ``form`` is the request form (or any mapping of the same string fields).
+    Raises ValueError for a malformed ``workers`` or ``strategy_budget``.
+    """
+    workers = parse_workers(form.get('workers'))
+    return {
+        'ordering': form.get('ordering', DEFAULT_ORDERING),
+        'parallel': _flag(form.get('parallel', 'false')),
+        # More worker processes than CPUs only adds start-up cost
+        'workers': min(workers, os.cpu_count() or 1) if workers else None,
+        'warm_start': _flag(form.get('warm_start', 'true')),
+        'response_format': form.get('format', 'verbose').strip().lower(),
+        'profile': _flag(form.get('profile', 'false')),
+        'validation': form.get('validation', 'warn').strip().lower(),
+        'mode': form.get('mode', 'per_model').strip().lower(),
+        'use_cache': _flag(form.get('cache', 'true')),
+        'strategies': form.get('strategy', 'first_fit'),
+        'strategy_budget': parse_strategy_budget(form.get('strategy_budget')),
+    }
+
+
+def parse_crane_pos(crane_pos_raw):
+    """Crane station numbers from a JSON string (or an already decoded list); anything invalid is dropped."""
+    try:
+        crane_pos = json.loads(crane_pos_raw) if isinstance(crane_pos_raw, str) and crane_pos_raw else crane_pos_raw
+        # Validate that it's a list of integers
+        if not isinstance(crane_pos, list):
+            crane_pos = []
+        # Ensure all elements are integers
+        crane_pos = [int(pos) for pos in crane_pos if isinstance(pos, (int, float, str)) and str(pos).isdigit()]
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.warning("Could not parse crane_pos '%s': %s", crane_pos_raw, e)
+        crane_pos = []
+    return crane_pos
+
+
+def read_uploaded_workbook(uploaded_file):
+    """
+    Validate and read one uploaded file.
+
+    The workbook stays in memory (``file_bytes``) and goes straight to the
+    parser; with ``LB_PERSIST_UPLOADS`` it is also kept in the content-addressed
+    upload store (``file_path``). Returns ``(workbook, None)`` or
+    ``(None, (response, status))``.
+    """
+    if not uploaded_file:
+        return None, (jsonify({
+            'success': False, 
+            'message': 'No file uploaded'
+        }), 400)
+
+    if uploaded_file.filename == '':
+        return None, (jsonify({
+            'success': False, 
+            'message': 'No file selected'
+        }), 400)
+
+    # Validate file extension
+    file_ext = os.path.splitext(uploaded_file.filename)[1].lower()
+    if file_ext not in SUPPORTED_EXTENSIONS:
+        return None, (jsonify({
+            'success': False, 
+            'message': f'Invalid file type. Allowed: {", ".join(sorted(SUPPORTED_EXTENSIONS))}'
+        }), 400)
+
+    # Read the file into memory, and keep a copy on disk only when configured to
+    file_bytes = uploaded_file.read()
+    content_hash = bytes_content_hash(file_bytes)
+    upload_path = upload_store.save(file_bytes, uploaded_file.filename, content_hash) if persist_uploads else None
+    return {
+        'file_name': uploaded_file.filename,
+        'file_bytes': file_bytes,
+        'file_path': upload_path,
+        'content_hash': content_hash
+    }, None
+
+
+def parse_lb_upload_form():
+    """
+    Validate the multipart line-balancing form and read the uploaded workbook.
+
+    Returns ``(parsed_data, None)`` on success, or ``(None, (response, status))``
+    with the error response to send back.
+    """
+    # 1. Get all form fields
+    date = request.form.get('date')
+    shift = request.form.get('shift')
+    line = request.form.get('line')
+    no_of_stations = request.form.get('noOfStations')
+    crane_pos_raw = request.form.get('crane_pos', '[]')
+    models_raw = request.form.get('models', '[]')
+    try:
+        options = parse_lb_options(request.form)
+    except ValueError as e:
+        return None, (jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400)
+
+    # 2. Parse the models JSON string
+    try:
+        models = json.loads(models_raw) if models_raw else []
+    except json.JSONDecodeError as e:
+        return None, (jsonify({
+            'success': False, 
+            'message': f'Invalid models JSON format: {str(e)}'
+        }), 400)
+
+    # 3. Parse the crane_pos JSON string
+    crane_pos = parse_crane_pos(crane_pos_raw)
+
+    # 4. Get and read the uploaded file
+    workbook, error = read_uploaded_workbook(request.files.get('workContent'))
+    if error:
+        return None, error
+
+    # 5. Build the data structure
+    parsed_data = {
+        'date': date,
+        'shift': shift,
+        'line': line,
+        'noOfStations': int(no_of_stations) if no_of_stations else 0,
+        'crane_pos': crane_pos,  # Now properly parsed as list
+        'models': models,
+        **options,
+        **workbook
+    }
+
+    logger.info("Parsed Data for Line Balancing: date=%s, shift=%s, line=%s, stations=%s, "
+                "crane_pos=%s, models=%s, file=%s (%d bytes, %s)", date, shift, line, parsed_data['noOfStations'],
+                crane_pos, models, workbook['file_name'], len(workbook['file_bytes']),
+                workbook['file_path'] or 'in memory')
+
+    return parsed_data, None
+
 
 @lb_uploadController_bp.route('/lb-upload', methods=['POST'])
 def calculate_lb_uploadController():
     try:
-        # 1. Get all form fields
-        date = request.form.get('date')
-        shift = request.form.get('shift')
-        line = request.form.get('line')
-        no_of_stations = request.form.get('noOfStations')
-        crane_pos_raw = request.form.get('crane_pos', '[]')
-        models_raw = request.form.get('models', '[]')
-
-        # 2. Parse the models JSON string
-        try:
-            models = json.loads(models_raw) if models_raw else []
-        except json.JSONDecodeError as e:
-            return jsonify({
-                'success': False, 
-                'message': f'Invalid models JSON format: {str(e)}'
-            }), 400
-
-        # 3. Parse the crane_pos JSON string
-        try:
-            crane_pos = json.loads(crane_pos_raw) if crane_pos_raw else []
-            # Validate that it's a list of integers
-            if not isinstance(crane_pos, list):
-                crane_pos = []
-            # Ensure all elements are integers
-            crane_pos = [int(pos) for pos in crane_pos if isinstance(pos, (int, float, str)) and str(pos).isdigit()]
-        except (json.JSONDecodeError, ValueError) as e:
-            print(f"Warning: Could not parse crane_pos '{crane_pos_raw}': {str(e)}")
-            crane_pos = []
+        started = time.perf_counter()
+        parsed_data, error = parse_lb_upload_form()
+        if error:
+            return error
+        upload_seconds = time.perf_counter() - started
 
-        # 4. Get the uploaded file
-        uploaded_file = request.files.get('workContent')
-
-        if not uploaded_file:
-            return jsonify({
-                'success': False, 
-                'message': 'No file uploaded'
-            }), 400
-
-        if uploaded_file.filename == '':
-            return jsonify({
-                'success': False, 
-                'message': 'No file selected'
-            }), 400
-
-        # 5. Validate file extension
-        allowed_extensions = {'.xlsx', '.xls', '.csv'}
-        file_ext = os.path.splitext(uploaded_file.filename)[1].lower()
-        if file_ext not in allowed_extensions:
-            return jsonify({
-                'success': False, 
-                'message': f'Invalid file type. Allowed: {", ".join(allowed_extensions)}'
-            }), 400
-
-        # 6. Save the file locally
-        upload_folder = 'uploads'
-        os.makedirs(upload_folder, exist_ok=True)
-        upload_path = os.path.join(upload_folder, uploaded_file.filename)
-        uploaded_file.save(upload_path)
-
-        # 7. Build the data structure
-        parsed_data = {
-            'date': date,
-            'shift': shift,
-            'line': line,
-            'noOfStations': int(no_of_stations) if no_of_stations else 0,
-            'crane_pos': crane_pos,  # Now properly parsed as list
-            'models': models,
-            'file_path': upload_path
-        }
-
-        print("="*80)
-        print("Parsed Data for Line Balancing:")
-        print(f"  Date: {date}")
-        print(f"  Shift: {shift}")
-        print(f"  Line: {line}")
-        print(f"  Number of Stations: {parsed_data['noOfStations']}")
-        print(f"  Crane Positions: {crane_pos}")
-        print(f"  Models: {models}")
-        print(f"  File Path: {upload_path}")
-        print("="*80)
-
-        # 8. Pass this to your processing function
+        # 6. Pass this to your processing function
         result = process_lb_file(parsed_data)
+        if result.get('errors'):
+            # Strict precedence validation rejected the workbook
+            return jsonify(result), 400
+        if result.get('success'):
+            # Form parsing and saving the upload happen before process_lb_file starts its clock
+            result['metadata']['timings']['phases']['upload'] = round(upload_seconds, 6)
 
-        # 9. Optional: Clean up the uploaded file after processing
-        # Uncomment the following lines if you want to delete the file after processing
-        # try:
-        #     if os.path.exists(upload_path):
-        #         os.remove(upload_path)
-        #         print(f"Cleaned up file: {upload_path}")
-        # except Exception as cleanup_error:
-        #     print(f"Warning: Could not delete file {upload_path}: {str(cleanup_error)}")
+        # 7. Stored uploads are pruned by the upload store (retention and size cap)
 
         return jsonify(result)
 
     except Exception as e:
         error_details = traceback.format_exc()
-        print("="*80)
-        print("ERROR in calculate_lb_uploadController:")
-        print(str(e))
-        print(error_details)
-        print("="*80)
+        logger.error("ERROR in calculate_lb_uploadController: %s\n%s", e, error_details)
         return jsonify({
             'success': False, 
             'message': str(e),
             'traceback': error_details
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@lb_uploadController_bp.route('/lb-cache', methods=['GET'])
+def lb_cache_statsController():
+    return jsonify({
+        'success': True,
+        'workbook_cache': workbook_cache.stats(),
+        'result_cache': result_cache.stats(),
+        'upload_store': dict(upload_store.stats(), persist_uploads=persist_uploads)
+    })
+
+
+@lb_uploadController_bp.route('/lb-cache', methods=['DELETE'])
+def lb_cache_invalidateController():
+    # ?workbook_hash=<sha256> drops one workbook's results; without it every result goes
+    content_hash = request.args.get('workbook_hash') or None
+    removed = result_cache.invalidate(content_hash)
+    logger.info("✅ Result cache invalidated (%s): %d entries", content_hash or 'all', removed)
+    return jsonify({
+        'success': True,
+        'removed': removed,
+        'workbook_hash': content_hash,
+        'result_cache': result_cache.stats()
+    })
@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Stored uploads are named <sha256 of the bytes><original extension>
+STORED_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.[0-9a-z]+$')
+
+
+def bytes_content_hash(content):
+    """SHA-256 of an in-memory upload; matches ``file_content_hash`` of the same bytes on disk."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class UploadStore:
+    """
+    Content-addressed folder of uploaded workbooks.
+
+    Identical uploads share one file, so concurrent uploads can never
+    overwrite each other. Files unused for ``retention`` seconds are removed
+    and, oldest first, so are files beyond ``max_bytes`` in total (0 turns
+    either limit off). Only content-addressed files are ever pruned; anything
+    else in the folder is left alone.
+    """
+
+    def __init__(self, folder='uploads', retention=7 * 24 * 3600, max_bytes=512 * 1024 * 1024):
+        self.folder = folder
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.saved = 0
+        self.reused = 0
+        self.pruned = 0
+
+    def save(self, content, filename, content_hash=None):
+        """Store ``content`` under its hash (once) and return the path."""
+        content_hash = content_hash or bytes_content_hash(content)
+        ext = os.path.splitext(filename)[1].lower()
+        path = os.path.join(self.folder, content_hash + ext)
+        with self._lock:
+            os.makedirs(self.folder, exist_ok=True)
+            if os.path.exists(path):
+                # Touch it, so retention and the size cap count from the last use
+                os.utime(path)
+                self.reused += 1
+            else:
+                tmp_path = f'{path}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'wb') as fh:
+                    fh.write(content)
+                os.replace(tmp_path, path)
+                self.saved += 1
+            self._prune(keep=path)
+        return path
+
+    def prune(self):
+        with self._lock:
+            return self._prune()
+
+    def _stored_files(self):
+        files = []
+        if not os.path.isdir(self.folder):
+            return files
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and STORED_NAME_PATTERN.match(entry.name):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(files)
+
+    def _prune(self, keep=None):
+        files = self._stored_files()
+        now = time.time()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if path == keep:
+                continue
+            too_old = bool(self.retention) and now - mtime > self.retention
+            too_big = bool(self.max_bytes) and total > self.max_bytes
+            if not (too_old or too_big):
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning("⚠️ Could not remove stored upload %s: %s", path, e)
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            logger.info("✅ Pruned %d stored upload(s), %d bytes kept", removed, total)
+        self.pruned += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            files = self._stored_files()
+            return {
+                'folder': self.folder,
+                'files': len(files),
+                'bytes': sum(size for _, size, _ in files),
+                'retention': self.retention,
+                'max_bytes': self.max_bytes,
+                'saved': self.saved,
+                'reused': self.reused,
+                'pruned': self.pruned,
+            }
+
+
+def workbook_source(parsed_data):
+    """
+    ``(source, filename)`` of the request's workbook for the loaders.
+
+    ``source`` is the uploaded bytes when the request kept them in memory,
+    otherwise the path of the stored file.
+    """
+    content = parsed_data.get('file_bytes')
+    if content is not None:
+        return content, parsed_data.get('file_name') or ''
+    return parsed_data['file_path'], parsed_data['file_path']
+
+
+# LB_PERSIST_UPLOADS=1 also keeps every upload on disk (e.g. to re-run or audit it later)
+persist_uploads = os.environ.get('LB_PERSIST_UPLOADS', 'false').strip().lower() in ('1', 'true', 'yes')
+
+upload_store = UploadStore(
+    folder=os.environ.get('LB_UPLOAD_DIR', 'uploads'),
+    retention=float(os.environ.get('LB_UPLOAD_RETENTION', 7 * 24 * 3600)),
+    max_bytes=int(os.environ.get('LB_UPLOAD_MAX_BYTES', 512 * 1024 * 1024)),
+)
@@ -1,7 +1,19 @@
+import logging
+import os
+
 from flask import Flask
 from flask_cors import CORS
 
 from api.lb_uploadController import lb_uploadController_bp
+from api.lb_jobController import lb_jobController_bp
+from api.lb_sweepController import lb_sweepController_bp
+from api.lb_batchController import lb_batchController_bp
+
+# LB_LOG_LEVEL=DEBUG brings back the full data / DataFrame / result dumps
+logging.basicConfig(
+    level=os.environ.get('LB_LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
 
 app = Flask(__name__)
 
@@ -15,6 +27,9 @@ CORS(
 
 # quality upload
 app.register_blueprint(lb_uploadController_bp, url_prefix='/api')
+app.register_blueprint(lb_jobController_bp, url_prefix='/api')
+app.register_blueprint(lb_sweepController_bp, url_prefix='/api')
+app.register_blueprint(lb_batchController_bp, url_prefix='/api')
 
 
 if __name__ == '__main__':
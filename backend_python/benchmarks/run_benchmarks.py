@@ -0,0 +1,349 @@
+"""
+Line-balancing benchmark harness.
+
+Generates synthetic ModelData workbooks, times every phase of the pipeline
+(parse, predecessor resolution, balancing, post-processing, end to end),
+records peak traced memory, and checks the station assignments against the
+frozen copy of the original algorithm in ``reference_lb.py`` (plus a small
+check of the mixed-mode task weighting).
+
+Run from ``backend_python``:
+
+    python -m benchmarks.run_benchmarks --suite quick
+    python -m benchmarks.run_benchmarks --suite full --compare benchmarks/results/<old>.json
+
+Results are written as JSON to ``benchmarks/results/`` (or ``--output``).
+With ``--compare`` any phase that got slower than ``--tolerance`` is flagged,
+and the exit code is non-zero on a regression or an assignment mismatch.
+Everything runs offline.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from api.lb import format_result, line_timing, process_lb_file
+from api.lb_cache import workbook_cache
+from api.lb_graph import DEFAULT_ORDERING, BalanceContext, balance_task_graph, build_task_graph
+from api.lb_loaders import load_excel_models
+from api.lb_mixed import build_mixed_graph
+
+from .reference_lb import make_final_result as reference_make_final_result
+from .synthetic import make_models, write_workbook
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+PHASES = ('parse', 'predecessors', 'balancing', 'post_processing', 'end_to_end')
+
+# Each case: graph shape and size, crane mix, and the line being balanced
+SUITES = {
+    'quick': [
+        {'name': 'chain-300', 'shape': 'chain', 'n_tasks': 300, 'depth': 300},
+        {'name': 'fanin-300', 'shape': 'fanin', 'n_tasks': 300, 'depth': 40},
+        {'name': 'random-500', 'shape': 'random', 'n_tasks': 500},
+        {'name': 'layered-500', 'shape': 'layered', 'n_tasks': 500, 'depth': 25},
+        {'name': 'crane-heavy-500', 'shape': 'random', 'n_tasks': 500, 'crane_mix': (0.1, 0.3, 0.6)},
+        {'name': 'skip-heavy-500', 'shape': 'random', 'n_tasks': 500, 'crane_mix': (0.5, 0.4, 0.1)},
+        {'name': 'models-4x300', 'shape': 'random', 'n_tasks': 300, 'n_models': 4},
+        {'name': 'stations-60', 'shape': 'random', 'n_tasks': 500, 'noOfStations': 60,
+         'crane_pos': [5, 20, 40]},
+    ],
+    'full': [
+        {'name': 'chain-2000', 'shape': 'chain', 'n_tasks': 2000, 'depth': 2000},
+        {'name': 'fanin-2000', 'shape': 'fanin', 'n_tasks': 2000, 'depth': 100},
+        {'name': 'random-1000', 'shape': 'random', 'n_tasks': 1000},
+        {'name': 'random-5000', 'shape': 'random', 'n_tasks': 5000},
+        {'name': 'layered-5000', 'shape': 'layered', 'n_tasks': 5000, 'depth': 200},
+        {'name': 'crane-heavy-2000', 'shape': 'random', 'n_tasks': 2000, 'crane_mix': (0.1, 0.3, 0.6)},
+        {'name': 'models-8x1000', 'shape': 'random', 'n_tasks': 1000, 'n_models': 8},
+        {'name': 'stations-200', 'shape': 'random', 'n_tasks': 2000, 'noOfStations': 200,
+         'crane_pos': [10, 50, 120, 180]},
+    ],
+}
+
+CASE_DEFAULTS = {
+    'depth': 50,
+    'n_models': 1,
+    'crane_mix': (0.1, 0.75, 0.15),
+    'noOfStations': 8,
+    'crane_pos': [2, 4],
+    'shift': 'General',
+    'units': 10,
+    'seed': 7,
+}
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit,
+    }
+
+
+class _Phases:
+    """Best-of-N wall time per phase, or peak traced memory per phase."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.peak_mb = {}
+        self.track_memory = False
+
+    @contextlib.contextmanager
+    def measure(self, phase):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            yield
+            self.peak_mb[phase] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            return
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.seconds[phase] = min(elapsed, self.seconds.get(phase, elapsed))
+
+
+def _assignments(solution):
+    return [(station['crane_aval'], list(station['task_order'])) for station in solution]
+
+
+def _verify(model_dfs, graphs, cycle_time, noOfStations, crane_pos, ordering):
+    """Compare station assignments with the original algorithm, per model."""
+    report = {}
+    for name, df in model_dfs.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = _assignments(reference_make_final_result(df.copy(), cycle_time, noOfStations, crane_pos))
+        legacy, _ = balance_task_graph(graphs[name], cycle_time, noOfStations, crane_pos, ordering='legacy')
+        current, _ = balance_task_graph(graphs[name], cycle_time, noOfStations, crane_pos, ordering=ordering)
+        report[name] = {
+            # The legacy ordering must reproduce the original exactly
+            'legacy_identical': _assignments(legacy) == expected,
+            f'{ordering}_identical': _assignments(current) == expected,
+            'reference_stations': len(expected),
+            f'{ordering}_stations': len(current),
+        }
+    return report
+
+
+def _max_level(graph):
+    """Longest predecessor chain of a case's graph (cycle edges ignored), reported as a shape statistic."""
+    rank = graph.topo_rank.tolist()
+    ptr = graph.pred_ptr.tolist()
+    preds = graph.pred_idx.tolist()
+    level = [0] * len(rank)
+    for task in np.argsort(graph.topo_rank).tolist():
+        for pred in preds[ptr[task]:ptr[task + 1]]:
+            if rank[pred] < rank[task] and level[pred] + 1 > level[task]:
+                level[task] = level[pred] + 1
+    return max(level, default=0)
+
+
+def check_mixed_weighting():
+    """
+    Two-model check of the shared task time in mixed mode.
+
+    T1 takes 10 minutes in both models but model B skips it, so with one
+    unit each only A's unit works on it: the shared time must be 5.0.
+    """
+    def model(crane):
+        return build_task_graph(pd.DataFrame({
+            'TOTAL Order': ['T1', 'T2'],
+            'Steps': ['Step 1', 'Step 2'],
+            'Time (in minutes)': [10.0, 4.0],
+            'Crane Required': [crane, 0],
+            'Predecessors': [np.nan, 'T1'],
+        }))
+
+    mixed = build_mixed_graph({'A': model(0), 'B': model(-1)}, {'A': 1, 'B': 1})
+    return {
+        'shared_times': mixed.graph.times.tolist(),
+        'shared_crane': mixed.graph.crane.tolist(),
+        'ok': mixed.graph.times.tolist() == [5.0, 4.0] and mixed.graph.crane.tolist() == [0.0, 0.0],
+    }
+
+
+def run_case(case, workdir, ordering=DEFAULT_ORDERING, repeat=1, track_memory=True, verify_max_tasks=600):
+    case = dict(CASE_DEFAULTS, **case)
+    models = make_models(case['n_models'], case['n_tasks'], shape=case['shape'], seed=case['seed'],
+                         crane_mix=case['crane_mix'], depth=case['depth'])
+    path = write_workbook(os.path.join(workdir, f"{case['name']}.xlsx"), models)
+    model_list = [{'name': name, 'quantity': max(1, case['units'] // case['n_models'])} for name in models]
+    _, _, cycle_time, _ = line_timing(case['shift'], model_list)
+    noOfStations, crane_pos = case['noOfStations'], case['crane_pos']
+
+    def run_phases(phases):
+        with contextlib.redirect_stdout(io.StringIO()):
+            with phases.measure('parse'):
+                model_dfs, _ = load_excel_models(path)
+
+        with phases.measure('predecessors'):
+            graphs = {name: build_task_graph(df) for name, df in model_dfs.items()}
+
+        solutions, iterations = {}, {}
+        with phases.measure('balancing'):
+            for name, graph in graphs.items():
+                context = BalanceContext(graph, ordering)
+                solutions[name], _ = balance_task_graph(graph, cycle_time, noOfStations, crane_pos,
+                                                        ordering=ordering, context=context)
+                iterations[name] = context.last_run['iterations']
+
+        with phases.measure('post_processing'):
+            format_result(solutions, model_dfs, noOfStations)
+
+        # Cold end-to-end run: the workbook cache would otherwise skip the parse
+        workbook_cache.clear()
+        parsed_data = {'shift': case['shift'], 'noOfStations': noOfStations, 'crane_pos': crane_pos,
+                       'models': model_list, 'ordering': ordering, 'file_path': path}
+        with contextlib.redirect_stdout(io.StringIO()):
+            with phases.measure('end_to_end'):
+                result = process_lb_file(parsed_data)
+        if not result['success']:
+            raise RuntimeError(f"process_lb_file failed for {case['name']}: {result['message']}")
+        return model_dfs, graphs, solutions, iterations
+
+    # Timed runs first, then one traced run: tracemalloc slows everything down
+    phases = _Phases()
+    for _ in range(repeat):
+        model_dfs, graphs, solutions, iterations = run_phases(phases)
+    if track_memory:
+        phases.track_memory = True
+        tracemalloc.start()
+        try:
+            run_phases(phases)
+        finally:
+            tracemalloc.stop()
+
+    graph_stats = {
+        name: {
+            'tasks': len(graph),
+            'edges': int(graph.pred_ptr[-1]),
+            'max_level': _max_level(graph),
+            'cyclic_tasks': int(graph.cyclic.sum()),
+            'stations': len(solutions[name]),
+            'iterations': iterations[name],
+        }
+        for name, graph in graphs.items()
+    }
+
+    verification = None
+    if verify_max_tasks and case['n_tasks'] <= verify_max_tasks:
+        verification = _verify(model_dfs, graphs, cycle_time, noOfStations, crane_pos, ordering)
+
+    return {
+        'case': {k: (list(v) if isinstance(v, tuple) else v) for k, v in case.items()},
+        'cycle_time': round(cycle_time, 4),
+        'seconds': {phase: round(phases.seconds[phase], 6) for phase in PHASES},
+        'peak_memory_mb': {phase: round(phases.peak_mb[phase], 3) for phase in PHASES} if track_memory else None,
+        'models': graph_stats,
+        'verification': verification,
+    }
+
+
+def compare_results(current, baseline, tolerance):
+    """Return ``(rows, regressions)`` comparing phase times case by case."""
+    previous = {entry['case']['name']: entry for entry in baseline['cases']}
+    rows, regressions = [], []
+    for entry in current['cases']:
+        name = entry['case']['name']
+        if name not in previous:
+            continue
+        for phase in PHASES:
+            old = previous[name]['seconds'].get(phase)
+            new = entry['seconds'][phase]
+            if not old:
+                continue
+            ratio = new / old
+            rows.append((name, phase, old, new, ratio))
+            if ratio > 1 + tolerance:
+                regressions.append((name, phase, ratio))
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick')
+    parser.add_argument('--cases', nargs='*', help='Only run cases whose name contains one of these')
+    parser.add_argument('--ordering', default=DEFAULT_ORDERING)
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is kept')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the extra traced run for peak memory')
+    parser.add_argument('--verify-max-tasks', type=int, default=600,
+                        help='Check against the original algorithm up to this many tasks per model (0 = never)')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<suite>-<timestamp>.json)')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before a phase is flagged')
+    args = parser.parse_args(argv)
+
+    cases = SUITES[args.suite]
+    if args.cases:
+        cases = [case for case in cases if any(part in case['name'] for part in args.cases)]
+
+    results = {
+        'suite': args.suite,
+        'ordering': args.ordering,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': _environment(),
+        'cases': [],
+    }
+
+    mismatches = []
+    results['mixed_weighting'] = check_mixed_weighting()
+    if not results['mixed_weighting']['ok']:
+        mismatches.append(('mixed_weighting', None, None))
+        print(f"❌ mixed mode shared times {results['mixed_weighting']['shared_times']}, expected [5.0, 4.0]")
+
+    with tempfile.TemporaryDirectory(prefix='lb-bench-') as workdir:
+        for case in cases:
+            entry = run_case(case, workdir, ordering=args.ordering, repeat=args.repeat,
+                             track_memory=not args.no_memory, verify_max_tasks=args.verify_max_tasks)
+            results['cases'].append(entry)
+
+            timings = '  '.join(f"{phase}={entry['seconds'][phase]:.4f}s" for phase in PHASES)
+            print(f"{case['name']:<18} {timings}")
+            for model, check in (entry['verification'] or {}).items():
+                # Both the legacy ordering and the one being benchmarked must match the original
+                for ordering in dict.fromkeys(('legacy', args.ordering)):
+                    if not check[f'{ordering}_identical']:
+                        mismatches.append((case['name'], model, ordering))
+                        print(f"❌ {case['name']}/{model}: {ordering} ordering differs from the original algorithm")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.suite}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as fh:
+        json.dump(results, fh, indent=2)
+    print(f"✅ Results written to {output}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        rows, regressions = compare_results(results, baseline, args.tolerance)
+        for name, phase, old, new, ratio in rows:
+            flag = '⚠️' if ratio > 1 + args.tolerance else '  '
+            print(f"{flag} {name:<18} {phase:<16} {old:.4f}s -> {new:.4f}s  x{ratio:.2f}")
+
+    return 1 if mismatches or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
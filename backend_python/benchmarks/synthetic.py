@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+
+# Graph shapes the generator understands
+SHAPES = ('chain', 'fanin', 'random', 'layered')
+
+# Default Crane Required weights for -1 / 0 / 1
+DEFAULT_CRANE_MIX = (0.1, 0.75, 0.15)
+
+
+def _predecessors(shape, n, rng, max_preds, depth):
+    orders = [f"T{i + 1}" for i in range(n)]
+    preds = []
+    for i in range(n):
+        if shape == 'chain':
+            # A single path, broken into `depth`-long chains
+            p = [orders[i - 1]] if i % depth else []
+        elif shape == 'fanin':
+            # Every `depth`-th task waits on the whole previous block
+            p = orders[max(0, i - depth):i] if i and i % depth == 0 else []
+        elif shape == 'layered':
+            # `depth` layers; each task depends on a few tasks of the layer before
+            width = max(1, n // depth)
+            layer_start = (i // width) * width
+            prev = orders[max(0, layer_start - width):layer_start]
+            p = rng.sample(prev, min(len(prev), rng.randint(1, max_preds))) if prev else []
+        else:
+            k = rng.randint(0, max_preds) if i else 0
+            p = rng.sample(orders[:i], min(i, k))
+        preds.append(", ".join(p) if p else np.nan)
+    return orders, preds
+
+
+def make_model_table(n_tasks, shape='random', crane_mix=DEFAULT_CRANE_MIX, depth=50,
+                     max_preds=3, time_range=(0.1, 6.0), seed=0):
+    """
+    Build a synthetic ModelData DataFrame.
+
+    ``shape`` is one of SHAPES; ``depth`` is the chain length for ``chain``,
+    the block size for ``fanin`` and the number of layers for ``layered``.
+    ``crane_mix`` weights Crane Required -1 / 0 / 1.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape '{shape}'. Expected one of: {', '.join(SHAPES)}")
+    rng = random.Random(seed)
+    depth = max(1, int(depth))
+    orders, preds = _predecessors(shape, n_tasks, rng, max_preds, depth)
+    return pd.DataFrame({
+        'TOTAL Order': orders,
+        'Steps': [f"Step {i + 1}" for i in range(n_tasks)],
+        'Time (in minutes)': [round(rng.uniform(*time_range), 3) for _ in range(n_tasks)],
+        'Crane Required': rng.choices([-1, 0, 1], weights=crane_mix, k=n_tasks),
+        'Predecessors': preds,
+        'Manpower (19)': [rng.choice([0.5, 1.0, 2.0]) for _ in range(n_tasks)],
+    })
+
+
+def make_models(n_models, n_tasks, shape='random', seed=0, **kwargs):
+    """``{model_name: DataFrame}`` for ``n_models`` synthetic models."""
+    return {
+        f"SYN{m + 1}": make_model_table(n_tasks, shape=shape, seed=seed * 1000 + m, **kwargs)
+        for m in range(n_models)
+    }
+
+
+def write_workbook(path, models):
+    """Write models as ``ModelData_<name>`` sheets (plus a filler sheet) to an .xlsx file."""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        pd.DataFrame({'Info': ['synthetic benchmark workbook']}).to_excel(writer, sheet_name='Summary', index=False)
+        for name, df in models.items():
+            df.to_excel(writer, sheet_name=f"ModelData_{name}", index=False)
+    return path